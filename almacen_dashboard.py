@@ -0,0 +1,388 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from almacenamiento_datos import leer_tabla, ruta_existente
+from esquema_datos import ESQUEMA_INCIDENCIA, ESQUEMA_LECTURA, MESES
+
+
+# Columnas de la tabla de hechos que se guardan en memoria
+COLUMNAS_DIMENSION = ["estado", "anio", "mes_num", "tipo_delito", "categoria_delito"]
+
+# Agrupaciones que usan las graficas, sus indices se calculan una vez al cargar
+GRUPOS = [
+    ("estado", "anio"),
+    ("categoria_delito", "estado"),
+    ("estado", "mes_num"),
+    ("anio", "mes_num", "tipo_delito"),
+    ("tipo_delito",),
+]
+
+# Ejes del cubo OLAP (arreglo denso con el total y el numero de registros de cada celda)
+EJES_CUBO = ["estado", "anio", "mes_num", "categoria_delito", "tipo_delito"]
+
+# Tipos de delito de la grafica de evolucion (mismo filtro que CONSULTAS["evolucion"])
+TIPOS_EVOLUCION = ["Homicidio", "Secuestro"]
+
+# Consultas para cargar el almacen desde MySQL (solo al iniciar o con una carga nueva)
+SQL_HECHOS = """
+SELECT
+    e.nombre AS estado,
+    i.anio,
+    i.mes_num,
+    t.nombre AS tipo_delito,
+    t.categoria AS categoria_delito,
+    i.cantidad
+FROM incidencia_delictiva i
+JOIN estados e ON i.id_estado = e.id_estado
+JOIN tipos_delito t ON i.id_tipo_delito = t.id_tipo_delito
+"""
+
+SQL_PERCEPCION = """
+SELECT
+    e.nombre AS estado,
+    p.anio,
+    p.percepcion_inseguridad
+FROM percepcion_seguridad p
+JOIN estados e ON p.id_estado = e.id_estado
+"""
+
+# Archivos de dataset/ para cargar el almacen sin MySQL
+ARCHIVO_HECHOS = "delitos_transformados"
+ARCHIVO_PERCEPCION = "percepcion_seguridad"
+
+
+class AlmacenColumnar:
+    """
+    Tabla de hechos de incidencia en memoria, por columnas
+    Cada dimension se guarda como codigos enteros con su lista de etiquetas, y cada
+    agrupacion de GRUPOS tiene un indice precalculado (grupo de cada registro), asi
+    una agregacion es un np.bincount sobre la columna cantidad
+    """
+
+    def __init__(self, df, df_percepcion, version=None):
+        self.version = version
+        self.registros = len(df)
+        self.cantidad = df["cantidad"].to_numpy(dtype=np.float64)
+        self.codigos = {}
+        self.etiquetas = {}
+
+        for columna in COLUMNAS_DIMENSION:
+            codigos, etiquetas = pd.factorize(df[columna], sort=True)
+            self.codigos[columna] = codigos.astype(np.int32)
+            self.etiquetas[columna] = np.asarray(etiquetas)
+
+        self.percepcion = df_percepcion[["estado", "anio", "percepcion_inseguridad"]].copy()
+        self.percepcion["estado"] = self.percepcion["estado"].astype(str)
+        self.percepcion["anio"] = self.percepcion["anio"].astype(int)
+
+        self.indices = {columnas: self._indice_grupo(columnas) for columnas in GRUPOS}
+        self.cubo = CuboIncidencia(self)
+        self._resultados = {}
+        self._candado = threading.Lock()
+
+    def _indice_grupo(self, columnas):
+        # Combina los codigos de las columnas en un solo codigo por registro y lo compacta
+        # Los registros con algun valor nulo (codigo -1) quedan fuera del indice
+        validos = np.ones(self.registros, dtype=bool)
+        combinado = np.zeros(self.registros, dtype=np.int64)
+
+        for columna in columnas:
+            codigos = self.codigos[columna]
+            validos &= codigos >= 0
+            combinado = combinado * len(self.etiquetas[columna]) + codigos
+
+        filas = None if validos.all() else np.flatnonzero(validos)
+        if filas is not None:
+            combinado = combinado[filas]
+
+        claves, grupo = np.unique(combinado, return_inverse=True)
+
+        # Separar la clave combinada en el codigo de cada columna
+        codigos_clave = []
+        for columna in reversed(columnas):
+            tamano = len(self.etiquetas[columna])
+            codigos_clave.append(claves % tamano)
+            claves = claves // tamano
+
+        return filas, grupo, list(reversed(codigos_clave))
+
+    def agregar(self, columnas, funcion="sum"):
+        """
+        Suma (o promedio) de cantidad por las columnas de una agrupacion de GRUPOS
+        """
+        filas, grupo, codigos_clave = self.indices[columnas]
+        cantidad = self.cantidad if filas is None else self.cantidad[filas]
+        grupos = len(codigos_clave[0])
+
+        valores = np.bincount(grupo, weights=cantidad, minlength=grupos)
+        if funcion == "mean":
+            valores = valores / np.bincount(grupo, minlength=grupos)
+        else:
+            valores = np.rint(valores).astype(np.int64)
+
+        datos = {columna: self.etiquetas[columna][codigos]
+                 for columna, codigos in zip(columnas, codigos_clave)}
+        datos["valor"] = valores
+
+        return pd.DataFrame(datos)
+
+    def consultar(self, nombre, usar_memoria=True):
+        """
+        Resultado de una de las consultas del dashboard, con las mismas columnas que en MySQL
+        Los resultados no cambian mientras no haya otra version, asi que se guardan
+        """
+        if usar_memoria:
+            with self._candado:
+                df = self._resultados.get(nombre)
+            if df is not None:
+                return df.copy()
+
+        df = CONSULTAS_MEMORIA[nombre](self)
+
+        if usar_memoria:
+            with self._candado:
+                self._resultados[nombre] = df
+
+        return df.copy()
+
+    def consultar_filtrado(self, nombres, filtros=None):
+        """
+        Resultados de varias consultas con filtros de estado, anio, categoria y rango de meses
+        Sin filtros activos se usan los resultados guardados; con filtros el cubo se rebana una vez
+        y todas las consultas se calculan sobre esa rebanada
+        """
+        if not filtros_activos(filtros):
+            return {nombre: self.consultar(nombre) for nombre in nombres}
+
+        vista = self.cubo.filtrar(filtros)
+        return {nombre: CONSULTAS_MEMORIA[nombre](vista) for nombre in nombres}
+
+
+def filtros_activos(filtros):
+    """
+    Indica si algun filtro restringe los datos (listas vacias o el rango completo no filtran)
+    """
+    if not filtros:
+        return False
+
+    meses = filtros.get("meses")
+    return (any(filtros.get(eje) for eje in ("estado", "anio", "categoria_delito"))
+            or (meses is not None and tuple(meses) != (1, 12)))
+
+
+class CuboIncidencia:
+    """
+    Cubo denso estado x anio x mes_num x categoria x tipo con el total de delitos
+    y el numero de registros de cada celda; una rebanada es indexar el arreglo
+    y cada agregacion es una suma sobre los ejes que no se agrupan
+    """
+
+    def __init__(self, almacen):
+        self.etiquetas = {}
+        codigos = []
+        forma = []
+
+        for eje in EJES_CUBO:
+            codigos_eje = almacen.codigos[eje]
+            etiquetas = almacen.etiquetas[eje]
+
+            # Los valores nulos ocupan una posicion extra con etiqueta None
+            if (codigos_eje < 0).any():
+                codigos_eje = np.where(codigos_eje < 0, len(etiquetas), codigos_eje)
+                etiquetas = np.append(etiquetas.astype(object), None)
+
+            self.etiquetas[eje] = etiquetas
+            codigos.append(codigos_eje)
+            forma.append(len(etiquetas))
+
+        celdas = int(np.prod(forma))
+        plano = np.ravel_multi_index(codigos, forma)
+        self.total = np.bincount(plano, weights=almacen.cantidad, minlength=celdas).reshape(forma)
+        self.conteo = np.bincount(plano, minlength=celdas).reshape(forma)
+        self.percepcion = almacen.percepcion
+
+    def filtrar(self, filtros=None):
+        """
+        Rebana el cubo con los filtros: listas de valores por eje y rango de meses (inicio, fin)
+        """
+        filtros = filtros or {}
+        mascaras = []
+
+        for eje in EJES_CUBO:
+            etiquetas = self.etiquetas[eje]
+            if eje == "mes_num" and filtros.get("meses"):
+                inicio, fin = filtros["meses"]
+                mascara = np.array([mes is not None and inicio <= mes <= fin for mes in etiquetas],
+                                   dtype=bool)
+            elif filtros.get(eje):
+                valores = set(filtros[eje])
+                mascara = np.array([etiqueta in valores for etiqueta in etiquetas], dtype=bool)
+            else:
+                mascara = np.ones(len(etiquetas), dtype=bool)
+            mascaras.append(mascara)
+
+        indices = np.ix_(*mascaras)
+        etiquetas = {eje: self.etiquetas[eje][mascara] for eje, mascara in zip(EJES_CUBO, mascaras)}
+
+        return VistaCubo(self.total[indices], self.conteo[indices], etiquetas, self.percepcion)
+
+
+class VistaCubo:
+    """
+    Rebanada del cubo; tiene la misma interfaz agregar que AlmacenColumnar,
+    asi las consultas de CONSULTAS_MEMORIA funcionan igual sobre datos filtrados
+    """
+
+    def __init__(self, total, conteo, etiquetas, percepcion):
+        self.total = total
+        self.conteo = conteo
+        self.etiquetas = etiquetas
+        self.percepcion = percepcion
+
+    def agregar(self, columnas, funcion="sum"):
+        ejes = sorted(columnas, key=EJES_CUBO.index)
+        otros = tuple(i for i, eje in enumerate(EJES_CUBO) if eje not in ejes)
+
+        total = self.total.sum(axis=otros)
+        conteo = self.conteo.sum(axis=otros)
+
+        # Solo las combinaciones con registros, como en un GROUP BY
+        posiciones = np.nonzero(conteo)
+        valores = total[posiciones]
+        if funcion == "mean":
+            valores = valores / conteo[posiciones]
+        else:
+            valores = np.rint(valores).astype(np.int64)
+
+        etiquetas = {eje: self.etiquetas[eje][indices] for eje, indices in zip(ejes, posiciones)}
+        datos = {columna: etiquetas[columna] for columna in columnas}
+        datos["valor"] = valores
+
+        df = pd.DataFrame(datos)
+        return df.dropna(subset=list(columnas)).reset_index(drop=True)
+
+
+def consulta_incidencia(almacen):
+    df = almacen.agregar(("estado", "anio")).rename(columns={"valor": "total_delitos"})
+    return df.sort_values(["anio", "total_delitos"], ascending=[True, False], ignore_index=True)
+
+
+def consulta_tipos_delito(almacen):
+    df = almacen.agregar(("categoria_delito", "estado")).rename(
+        columns={"categoria_delito": "tipo_delito", "valor": "total"})
+    return df[["tipo_delito", "estado", "total"]].sort_values("total", ascending=False, ignore_index=True)
+
+
+def consulta_promedio_mensual(almacen):
+    df = almacen.agregar(("estado", "mes_num"), "mean").rename(columns={"valor": "promedio"})
+    df["mes"] = [MESES[mes - 1] for mes in df["mes_num"]]
+    df = df[["estado", "mes", "mes_num", "promedio"]]
+    return df.sort_values("mes_num", kind="stable", ignore_index=True)
+
+
+def consulta_evolucion(almacen):
+    df = almacen.agregar(("anio", "mes_num", "tipo_delito")).rename(columns={"valor": "total"})
+    df = df[df["tipo_delito"].isin(TIPOS_EVOLUCION)]
+    df = df.sort_values(["anio", "mes_num"], kind="stable")
+    df["fecha"] = [f"{anio}-{mes:02d}" for anio, mes in zip(df["anio"], df["mes_num"])]
+    return df[["fecha", "tipo_delito", "total"]].reset_index(drop=True)
+
+
+def consulta_distribucion(almacen):
+    df = almacen.agregar(("tipo_delito",)).rename(columns={"valor": "total"})
+    return df.sort_values("total", ascending=False, ignore_index=True)
+
+
+def consulta_percepcion(almacen):
+    df = almacen.agregar(("estado", "anio")).rename(columns={"valor": "total_delitos"})
+    df["estado"] = df["estado"].astype(str)
+    df["anio"] = df["anio"].astype(int)
+    df = df.merge(almacen.percepcion, on=["estado", "anio"], how="inner")
+    return df.sort_values(["anio", "estado"], ignore_index=True)
+
+
+# Misma llave que CONSULTAS en dashboard.py
+CONSULTAS_MEMORIA = {
+    "incidencia": consulta_incidencia,
+    "tipos_delito": consulta_tipos_delito,
+    "promedio_mensual": consulta_promedio_mensual,
+    "evolucion": consulta_evolucion,
+    "distribucion": consulta_distribucion,
+    "percepcion": consulta_percepcion,
+}
+
+
+def cargar_desde_mysql(engine, version=None):
+    """
+    Carga la tabla de hechos y la percepcion desde MySQL
+    """
+    with engine.connect() as conexion:
+        df = pd.read_sql(SQL_HECHOS, conexion)
+        df_percepcion = pd.read_sql(SQL_PERCEPCION, conexion)
+
+    return AlmacenColumnar(df, df_percepcion, version)
+
+
+def cargar_desde_archivos(version=None):
+    """
+    Carga la tabla de hechos y la percepcion desde los archivos de dataset/ (Parquet o CSV)
+    Si no existen los delitos transformados se categoriza la incidencia extraida
+    """
+    ruta, _ = ruta_existente(ARCHIVO_HECHOS)
+    if os.path.exists(ruta):
+        df = leer_tabla(ARCHIVO_HECHOS, esquema=ESQUEMA_INCIDENCIA)
+    else:
+        from transformacion_datos import categorizar_delitos, limpiar_datos
+        df = limpiar_datos(leer_tabla("incidencia_delictiva", esquema=ESQUEMA_LECTURA))
+        df["categoria_delito"] = categorizar_delitos(df["tipo_delito"])
+
+    return AlmacenColumnar(df, leer_tabla(ARCHIVO_PERCEPCION), version)
+
+
+def version_archivos():
+    """
+    Version de los archivos de dataset/: la fecha de modificacion mas reciente
+    """
+    rutas = [ruta_existente(nombre)[0] for nombre in (ARCHIVO_HECHOS, "incidencia_delictiva",
+                                                      ARCHIVO_PERCEPCION)]
+    return max((os.path.getmtime(ruta) for ruta in rutas if os.path.exists(ruta)), default=None)
+
+
+def medir_consultas(almacen, repeticiones=100, filtros=None):
+    """
+    Mide el tiempo de cada consulta sobre el almacen sin usar los resultados guardados
+    Con filtros se mide la rebanada del cubo mas la consulta
+    """
+    print("\n=== TIEMPO DE CONSULTAS EN MEMORIA ===")
+    print(f" Registros en memoria: {almacen.registros}")
+
+    resultados = []
+
+    for nombre in CONSULTAS_MEMORIA:
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            if filtros_activos(filtros):
+                CONSULTAS_MEMORIA[nombre](almacen.cubo.filtrar(filtros))
+            else:
+                almacen.consultar(nombre, usar_memoria=False)
+            tiempos.append(time.perf_counter() - inicio)
+
+        resultados.append({
+            "consulta": nombre,
+            "mediana_us": round(float(np.median(tiempos)) * 1e6, 1),
+            "p95_us": round(float(np.percentile(tiempos, 95)) * 1e6, 1),
+        })
+
+    df_resultados = pd.DataFrame(resultados)
+    print(df_resultados.to_string(index=False))
+
+    return df_resultados
+
+
+if __name__ == "__main__":
+    almacen = cargar_desde_archivos(version_archivos())
+    medir_consultas(almacen)
+    medir_consultas(almacen, filtros={"anio": [2024], "meses": (1, 6)})
@@ -0,0 +1,127 @@
+import os
+import time
+import pandas as pd
+from esquema_datos import COLUMNAS_DERIVADAS, aplicar_esquema, derivar_fecha_periodo, tipos_lectura
+
+
+# Formato de los archivos intermedios en dataset/: "csv", "parquet" o "feather"
+# parquet y feather requieren pyarrow
+FORMATO_DATOS = "csv"
+DIRECTORIO_DATOS = "dataset"
+
+# Columnas de texto con pocos valores distintos, se guardan como categoricas
+# (en parquet/feather quedan con dictionary encoding)
+COLUMNAS_CATEGORICAS = ["estado", "mes", "tipo_delito", "subtipo_delito",
+                        "modalidad", "categoria_delito"]
+
+EXTENSIONES = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+
+def ruta_datos(nombre, formato=None):
+    """
+    Retorna la ruta del archivo en dataset/ con la extension del formato
+    """
+    formato = formato or FORMATO_DATOS
+    base = os.path.splitext(nombre)[0]
+    return os.path.join(DIRECTORIO_DATOS, base + EXTENSIONES[formato])
+
+
+def ruta_existente(nombre, formato=None):
+    """
+    Retorna (ruta, formato) del archivo a leer
+    Si el archivo no existe en ese formato se usa el CSV (los datos incluidos en el repo son CSV)
+    """
+    formato = formato or FORMATO_DATOS
+    ruta = ruta_datos(nombre, formato)
+
+    if formato != "csv" and not os.path.exists(ruta):
+        formato = "csv"
+        ruta = ruta_datos(nombre, formato)
+
+    return ruta, formato
+
+
+def guardar_tabla(df, nombre, formato=None):
+    """
+    Guarda un DataFrame en dataset/ con el formato configurado
+    En CSV se agregan las columnas derivadas fecha y periodo para mantener el formato original
+    """
+    formato = formato or FORMATO_DATOS
+    os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+    ruta = ruta_datos(nombre, formato)
+
+    if formato == "csv":
+        if {"anio", "mes_num"} <= set(df.columns) and "fecha" not in df.columns:
+            df = derivar_fecha_periodo(df)
+        df.to_csv(ruta, index=False, encoding='utf-8')
+    else:
+        df = df.copy()
+        for columna in COLUMNAS_CATEGORICAS:
+            if columna in df.columns and df[columna].dtype == object:
+                df[columna] = df[columna].astype("category")
+
+        if formato == "parquet":
+            df.to_parquet(ruta, index=False)
+        else:
+            df.reset_index(drop=True).to_feather(ruta)
+
+    print(f" Guardado: {ruta}")
+    return ruta
+
+
+def leer_tabla(nombre, formato=None, esquema=None):
+    """
+    Lee un DataFrame de dataset/ con el formato configurado (o el CSV si no existe)
+    Con esquema las columnas se convierten a tipos compactos y se omiten las derivadas
+    """
+    ruta, formato = ruta_existente(nombre, formato)
+
+    if formato == "parquet":
+        df = pd.read_parquet(ruta)
+    elif formato == "feather":
+        df = pd.read_feather(ruta)
+    elif esquema is not None:
+        # Los tipos se aplican al leer para no cargar columnas de texto como object
+        columnas = pd.read_csv(ruta, encoding='utf-8', nrows=0).columns
+        df = pd.read_csv(ruta, encoding='utf-8',
+                         usecols=[c for c in columnas if c not in COLUMNAS_DERIVADAS],
+                         dtype=tipos_lectura(columnas, esquema))
+    else:
+        return pd.read_csv(ruta, encoding='utf-8')
+
+    return aplicar_esquema(df, esquema) if esquema is not None else df
+
+
+def comparar_formatos(df, nombre="comparacion_formatos", formatos=("csv", "parquet", "feather")):
+    """
+    Mide tiempo de escritura, tiempo de lectura y tamaño de archivo de cada formato
+    """
+    print("\n=== COMPARANDO FORMATOS DE ALMACENAMIENTO ===")
+
+    resultados = []
+
+    for formato in formatos:
+        inicio = time.perf_counter()
+        ruta = guardar_tabla(df, nombre, formato)
+        escritura = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        leer_tabla(nombre, formato)
+        lectura = time.perf_counter() - inicio
+
+        resultados.append({
+            "formato": formato,
+            "escritura_ms": round(escritura * 1000, 1),
+            "lectura_ms": round(lectura * 1000, 1),
+            "tamano_kb": round(os.path.getsize(ruta) / 1024, 1),
+        })
+        os.remove(ruta)
+
+    df_resultados = pd.DataFrame(resultados)
+    print(df_resultados.to_string(index=False))
+
+    return df_resultados
+
+
+if __name__ == "__main__":
+    comparar_formatos(leer_tabla("incidencia_delictiva", "csv"))
@@ -1,5 +1,12 @@
-from mysql.connector import connect, Error
+from mysql.connector import pooling, Error
+from contextlib import contextmanager
 import pandas as pd
+import csv
+from almacenamiento_datos import leer_tabla
+from esquema_datos import ESQUEMA_INCIDENCIA, derivar_fecha_periodo, reportar_memoria
+import os
+import tempfile
+import time
 
 
 class DataDB:
@@ -9,19 +16,48 @@ class DataDB:
     NAME_BD = "seguridad_mexico"
     SERVER = "localhost"
 
+    #Configuración de la carga masiva
+    MODO_CARGA = "executemany"   # "executemany" o "load_data"
+    TAMANO_LOTE = 1000
+    LOTE_COMMIT = 10000          # registros entre cada commit
+    TAMANO_POOL = 3
+    CARGA_INCREMENTAL = True     # solo envia registros nuevos o con cantidad distinta
 
-def conectar():
 
-    #Establece conexión con la base de datos mysql
-    #La base de datos previamente creada en mysql
+_pool = None
 
-    try:
-        conexion = connect(
+
+def obtener_pool():
+
+    #Crea el pool de conexiones la primera vez que se usa
+    #Todas las etapas de la carga reutilizan las conexiones del pool
+    #LOAD DATA LOCAL se permite siempre: el modo se puede elegir por llamada
+    #en insertar_incidencia_delictiva, no solo con DataDB.MODO_CARGA
+
+    global _pool
+
+    if _pool is None:
+        _pool = pooling.MySQLConnectionPool(
+            pool_name="carga_bd",
+            pool_size=DataDB.TAMANO_POOL,
             host=DataDB.SERVER,
             user=DataDB.USER,
             password=DataDB.PASSWORD,
-            database=DataDB.NAME_BD
+            database=DataDB.NAME_BD,
+            allow_local_infile=True
         )
+
+    return _pool
+
+
+def conectar():
+
+    #Obtiene una conexión del pool de la base de datos mysql
+    #La base de datos previamente creada en mysql
+    #Al cerrar la conexión esta regresa al pool
+
+    try:
+        conexion = obtener_pool().get_connection()
         print(" Conexión exitosa a la base de datos")
         return conexion
     except Error as e:
@@ -31,200 +67,464 @@ def conectar():
         return None
 
 
-def obtener_id_estado(nombre_estado, cursor):
+@contextmanager
+def etapa_carga(nombre):
 
-    #Obtiene el id de un estado por su nombre
+    #Entrega una conexión y un cursor para una etapa de la carga
+    #Confirma la transacción al terminar o hace rollback si la etapa falla
+    #Lo confirmado por lotes con confirmar_lote ya no se revierte
 
-    sql = "SELECT id_estado FROM estados WHERE nombre = %s"
-    cursor.execute(sql, (nombre_estado,))
-    resultado = cursor.fetchone()
-    return resultado[0] if resultado else None
+    conexion = conectar()
+    if not conexion:
+        raise Error(msg=f"No hay conexión para la etapa {nombre}")
 
+    cursor = conexion.cursor()
 
-def insertar_tipo_delito(nombre, subtipo, modalidad, categoria, cursor):
+    try:
+        yield conexion, cursor
+        conexion.commit()
+    except Exception:
+        print(f" Rollback de la etapa: {nombre}")
+        conexion.rollback()
+        raise
+    finally:
+        cursor.close()
+        conexion.close()
 
-    #Inserta un tipo de delito y retorna su id
-    #Si ya existe, retorna el id existente
 
-    # Verificar si ya existe
-    sql_buscar = """SELECT id_tipo_delito FROM tipos_delito 
-                    WHERE nombre = %s AND subtipo = %s AND modalidad = %s"""
-    cursor.execute(sql_buscar, (nombre, subtipo, modalidad))
-    resultado = cursor.fetchone()
+def confirmar_lote(conexion, pendientes):
 
-    if resultado:
-        return resultado[0]
+    #Hace commit cuando se acumulan DataDB.LOTE_COMMIT registros sin confirmar
+    #Evita que el undo log de InnoDB crezca en cargas grandes
+    #Retorna cuantos registros quedan pendientes
 
-    # Si no existe, insertar
-    sql_insertar = """INSERT INTO tipos_delito (nombre, subtipo, modalidad, categoria) 
-                      VALUES (%s, %s, %s, %s)"""
-    cursor.execute(sql_insertar, (nombre, subtipo, modalidad, categoria))
-    return cursor.lastrowid
+    if conexion is not None and pendientes >= DataDB.LOTE_COMMIT:
+        conexion.commit()
+        return 0
 
+    return pendientes
 
-def insertar_tipos_delito(df):
 
-    #Inserta todos los tipos de delito unicos del DataFrame
+COLUMNAS_CLAVE_DELITO = ["tipo_delito", "subtipo_delito", "modalidad"]
 
-    print("\n=== INSERTANDO TIPOS DE DELITO ===")
 
-    conexion = conectar()
-    if not conexion:
-        return
+def cargar_dimensiones(cursor):
 
-    cursor = conexion.cursor()
+    #Carga las tablas estados y tipos_delito en diccionarios
+    #Se ejecuta una vez por carga en lugar de una consulta por registro
 
-    # Obtener combinaciones únicas de delitos
-    delitos_unicos = df[['tipo_delito', 'subtipo_delito', 'modalidad', 'categoria_delito']].drop_duplicates()
+    cursor.execute("SELECT nombre, id_estado FROM estados")
+    estados = {nombre: id_estado for nombre, id_estado in cursor.fetchall()}
 
-    registros_insertados = 0
+    cursor.execute("SELECT nombre, subtipo, modalidad, id_tipo_delito FROM tipos_delito")
+    tipos = {(nombre, subtipo, modalidad): id_tipo
+             for nombre, subtipo, modalidad, id_tipo in cursor.fetchall()}
 
-    for _, row in delitos_unicos.iterrows():
-        try:
-            insertar_tipo_delito(
-                row['tipo_delito'],
-                row['subtipo_delito'],
-                row['modalidad'],
-                row['categoria_delito'],
-                cursor
-            )
-            registros_insertados += 1
-        except Error as e:
-            print(f"Error al insertar delito: {e}")
+    return estados, tipos
+
+
+def resolver_ids(df, dimensiones):
+
+    #Agrega las columnas id_estado e id_tipo_delito al DataFrame
+    #Se resuelven con un merge de pandas contra los diccionarios de dimensiones
+
+    estados, tipos = dimensiones
+
+    df_estados = pd.DataFrame(list(estados.items()), columns=["estado", "id_estado"])
+    df_tipos = pd.DataFrame(
+        [(*clave, id_tipo) for clave, id_tipo in tipos.items()],
+        columns=COLUMNAS_CLAVE_DELITO + ["id_tipo_delito"]
+    )
+
+    resultado = df.merge(df_estados, on="estado", how="left")
+    if "tipo_delito" in df.columns:
+        resultado = resultado.merge(df_tipos, on=COLUMNAS_CLAVE_DELITO, how="left")
+
+    return resultado
 
-    conexion.commit()
-    cursor.close()
-    conexion.close()
 
-    print(f" Tipos de delito insertados: {registros_insertados}")
+def insertar_estados(df, estados, cursor):
 
+    #Inserta en un solo lote los estados del DataFrame que aun no existen
+    #Sin esto los registros de un estado nuevo (ESTADOS_INTERES) se omitirian en la carga
 
-def obtener_id_tipo_delito(nombre, subtipo, modalidad, cursor):
+    nombres = df["estado"].dropna().astype(str).unique().tolist()
+    nuevos = [(nombre,) for nombre in nombres if nombre not in estados]
 
-    #Obtiene el id de un tipo de delito por su nombre, subtipo y modalidad
+    if nuevos:
+        cursor.executemany("INSERT INTO estados (nombre) VALUES (%s)", nuevos)
+    print(f" Estados insertados: {len(nuevos)}")
+    print(f" Estados existentes: {len(nombres) - len(nuevos)}")
 
-    sql = """SELECT id_tipo_delito FROM tipos_delito 
+
+def insertar_tipos_delito(df, cursor, tipos):
+
+    #Inserta en un solo lote los tipos de delito unicos del DataFrame que aun no existen
+
+    # Obtener combinaciones únicas de delitos que no están en la base de datos
+    delitos_unicos = df[COLUMNAS_CLAVE_DELITO + ['categoria_delito']].drop_duplicates(
+        subset=COLUMNAS_CLAVE_DELITO)
+    nuevos = [
+        tuple(fila) for fila in
+        delitos_unicos.astype(object).where(delitos_unicos.notna(), None).values.tolist()
+        if tuple(fila[:3]) not in tipos
+    ]
+
+    sql = """INSERT INTO tipos_delito (nombre, subtipo, modalidad, categoria) 
+             VALUES (%s, %s, %s, %s)"""
+
+    if nuevos:
+        cursor.executemany(sql, nuevos)
+    print(f" Tipos de delito insertados: {len(nuevos)}")
+    print(f" Tipos de delito existentes: {len(delitos_unicos) - len(nuevos)}")
+
+
+def insertar_dimensiones(df, df_percepcion=None):
+
+    #Inserta los estados y tipos de delito que faltan en los catalogos
+    #Retorna las dimensiones actualizadas para reutilizarlas en la carga
+
+    print("\n=== INSERTANDO CATALOGOS (ESTADOS Y TIPOS DE DELITO) ===")
+
+    with etapa_carga("catálogos") as (conexion, cursor):
+        estados, tipos = cargar_dimensiones(cursor)
+
+        df_estados = df[["estado"]]
+        if df_percepcion is not None:
+            df_estados = pd.concat([df_estados, df_percepcion[["estado"]]])
+
+        insertar_estados(df_estados, estados, cursor)
+        insertar_tipos_delito(df, cursor, tipos)
+        conexion.commit()
+
+        # Recargar para obtener los ids asignados
+        dimensiones = cargar_dimensiones(cursor)
+
+    return dimensiones
+
+
+# Usa la llave unica uk_tipo_delito (nombre, subtipo, modalidad)
+SQL_ID_TIPO_DELITO = """SELECT id_tipo_delito FROM tipos_delito 
              WHERE nombre = %s AND subtipo = %s AND modalidad = %s"""
-    cursor.execute(sql, (nombre, subtipo, modalidad))
-    resultado = cursor.fetchone()
-    return resultado[0] if resultado else None
 
 
-def insertar_incidencia_delictiva(df):
+COLUMNAS_INCIDENCIA = ("anio", "mes", "mes_num", "id_estado", "id_tipo_delito", "cantidad",
+                       "fecha", "periodo", "porcentaje_estado", "cantidad_normalizada")
 
-    #Inserta datos de incidencia delictiva en la base de datos
+# Grano de la tabla de hechos (llave unica uk_incidencia_grano)
+COLUMNAS_GRANO = ["anio", "mes_num", "id_estado", "id_tipo_delito"]
 
-    print("\n=== INSERTANDO INCIDENCIA DELICTIVA ===")
 
-    conexion = conectar()
-    if not conexion:
-        return
+def filtrar_registros_cambiados(columnas, cursor):
 
-    cursor = conexion.cursor()
+    #Compara contra lo guardado y conserva solo registros nuevos o con otra cantidad
+    #El SESNSP revisa los meses recientes, asi solo se reenvian esos meses
+
+    anios = columnas["anio"].unique().tolist()
+    if not anios:
+        return columnas
+
+    sql = f"""SELECT anio, mes_num, id_estado, id_tipo_delito, cantidad
+              FROM incidencia_delictiva
+              WHERE anio IN ({", ".join(["%s"] * len(anios))})
+              ORDER BY id_incidencia"""
+    cursor.execute(sql, [int(anio) for anio in anios])
+    guardados = pd.DataFrame(cursor.fetchall(), columns=COLUMNAS_GRANO + ["cantidad_guardada"])
+
+    # Una base sin uk_incidencia_grano puede tener el mismo grano varias veces;
+    # se compara contra la fila mas reciente para no multiplicar los registros en el merge
+    duplicados = guardados.duplicated(subset=COLUMNAS_GRANO, keep="last")
+    if duplicados.any():
+        print(f" Aviso: {int(duplicados.sum())} registros duplicados en incidencia_delictiva; "
+              f"ejecutar migracion_carga_incremental.sql")
+        guardados = guardados[~duplicados]
+
+    comparacion = columnas.merge(guardados, on=COLUMNAS_GRANO, how="left")
+    cambiados = comparacion["cantidad_guardada"].isna() | (
+        comparacion["cantidad_guardada"] != comparacion["cantidad"])
+
+    print(f" Registros nuevos o revisados: {int(cambiados.sum())}")
+    print(f" Registros sin cambios: {int((~cambiados).sum())}")
+
+    return columnas[cambiados.to_numpy()]
+
+
+def preparar_filas_incidencia(df, dimensiones, cursor=None):
+
+    #Convierte el DataFrame en una lista de tuplas lista para insertar
+    #Los registros sin estado o tipo de delito en la base de datos se omiten
+    #Con cursor solo se conservan los registros que cambiaron desde la ultima carga
+
+    resuelto = resolver_ids(df, dimensiones)
+    validos = resuelto["id_estado"].notna() & resuelto["id_tipo_delito"].notna()
+    datos = resuelto[validos]
 
-    sql = """INSERT INTO incidencia_delictiva 
-             (anio, mes, mes_num, id_estado, id_tipo_delito, cantidad, fecha, periodo, 
-              porcentaje_estado, cantidad_normalizada)
-             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+    # fecha y periodo se derivan solo para los registros que se van a insertar
+    if "fecha" not in datos.columns:
+        datos = derivar_fecha_periodo(datos)
+
+    columnas = pd.DataFrame({
+        "anio": datos["anio"].astype(int),
+        "mes": datos["mes"].astype(str),
+        "mes_num": datos["mes_num"].astype(int),
+        "id_estado": datos["id_estado"].astype(int),
+        "id_tipo_delito": datos["id_tipo_delito"].astype(int),
+        "cantidad": datos["cantidad"].astype(int),
+        "fecha": datos["fecha"].astype(str),
+        "periodo": datos["periodo"].astype(str),
+        "porcentaje_estado": datos.get("porcentaje_estado", 0.0),
+        "cantidad_normalizada": datos.get("cantidad_normalizada", 0.0),
+    }, columns=list(COLUMNAS_INCIDENCIA))
+    columnas[["porcentaje_estado", "cantidad_normalizada"]] = (
+        columnas[["porcentaje_estado", "cantidad_normalizada"]].astype(float).fillna(0.0))
+
+    if cursor is not None:
+        columnas = filtrar_registros_cambiados(columnas, cursor)
+
+    # astype(object) convierte los tipos de numpy a tipos nativos de Python
+    filas = [tuple(fila) for fila in columnas.astype(object).values.tolist()]
+
+    return filas, int((~validos).sum())
+
+
+def cargar_con_executemany(filas, cursor, tamano_lote, conexion=None, incremental=False):
+
+    #Inserta las filas en lotes con executemany
+    #Si un lote falla se reintenta fila por fila para no perder el resto
+    #Con conexion se hace commit cada DataDB.LOTE_COMMIT registros
+    #En modo incremental los registros existentes se actualizan (upsert)
+
+    sql = f"""INSERT INTO incidencia_delictiva ({", ".join(COLUMNAS_INCIDENCIA)})
+             VALUES ({", ".join(["%s"] * len(COLUMNAS_INCIDENCIA))})"""
+
+    if incremental:
+        actualizables = [c for c in COLUMNAS_INCIDENCIA if c not in COLUMNAS_GRANO]
+        sql += " ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in actualizables)
 
     registros_insertados = 0
     registros_omitidos = 0
+    pendientes = 0
 
-    for index, row in df.iterrows():
-        id_estado = obtener_id_estado(row["estado"], cursor)
-        id_tipo_delito = obtener_id_tipo_delito(
-            row["tipo_delito"],
-            row["subtipo_delito"],
-            row["modalidad"],
-            cursor
-        )
+    for inicio in range(0, len(filas), tamano_lote):
+        lote = filas[inicio:inicio + tamano_lote]
+        try:
+            cursor.executemany(sql, lote)
+            registros_insertados += len(lote)
+        except Error as e:
+            print(f"Error en lote {inicio}-{inicio + len(lote)}: {e}")
+            for fila in lote:
+                try:
+                    cursor.execute(sql, fila)
+                    registros_insertados += 1
+                except Error as e:
+                    print(f"Error al insertar registro {fila}: {e}")
+                    registros_omitidos += 1
+
+        pendientes = confirmar_lote(conexion, pendientes + len(lote))
+        print(f"  Insertados: {registros_insertados} registros...")
+
+    return registros_insertados, registros_omitidos
+
+
+def cargar_con_load_data(filas, cursor, incremental=False):
+
+    #Escribe las filas en un CSV temporal y lo envia con LOAD DATA LOCAL INFILE
+    #Requiere local_infile=1 en el servidor MySQL
+    #En modo incremental se usa REPLACE para sobrescribir los registros existentes
 
-        if id_estado and id_tipo_delito:
-            try:
-                valores = (
-                    int(row["anio"]),
-                    str(row["mes"]),
-                    int(row["mes_num"]),
-                    id_estado,
-                    id_tipo_delito,
-                    int(row["cantidad"]),
-                    str(row["fecha"]),
-                    str(row["periodo"]),
-                    float(row.get("porcentaje_estado", 0)),
-                    float(row.get("cantidad_normalizada", 0))
-                )
-                cursor.execute(sql, valores)
-                registros_insertados += 1
-
-                if registros_insertados % 100 == 0:
-                    print(f"  Insertados: {registros_insertados} registros...")
-
-            except Error as e:
-                print(f"Error al insertar registro {index}: {e}")
-                registros_omitidos += 1
+    descriptor, ruta_temporal = tempfile.mkstemp(suffix=".csv")
+
+    try:
+        with os.fdopen(descriptor, "w", newline="", encoding="utf-8") as archivo:
+            escritor = csv.writer(archivo, lineterminator="\n")
+            escritor.writerows(filas)
+
+        sql = f"""LOAD DATA LOCAL INFILE %s {"REPLACE" if incremental else ""} INTO TABLE incidencia_delictiva
+                 CHARACTER SET utf8mb4
+                 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+                 LINES TERMINATED BY '\\n'
+                 ({", ".join(COLUMNAS_INCIDENCIA)})"""
+        cursor.execute(sql, (ruta_temporal,))
+        registros_insertados = cursor.rowcount
+        if incremental:
+            # REPLACE cuenta dos filas afectadas por cada registro reemplazado
+            registros_insertados = min(registros_insertados, len(filas))
+
+    finally:
+        os.remove(ruta_temporal)
+
+    return registros_insertados, len(filas) - registros_insertados
+
+
+# Columnas derivadas que dependen de otros registros: el total del estado y el min/max global
+# En carga incremental se recalculan en MySQL despues del upsert, para los registros no reenviados
+SQL_RECALCULAR_PORCENTAJE = """
+    UPDATE incidencia_delictiva i
+    JOIN (SELECT id_estado, SUM(cantidad) AS total
+          FROM incidencia_delictiva
+          WHERE id_estado IN ({estados})
+          GROUP BY id_estado) t ON i.id_estado = t.id_estado
+    SET i.porcentaje_estado = i.cantidad / t.total * 100"""
+
+SQL_RECALCULAR_NORMALIZADA = """
+    UPDATE incidencia_delictiva i
+    JOIN (SELECT MIN(cantidad) AS minimo, NULLIF(MAX(cantidad) - MIN(cantidad), 0) AS rango
+          FROM incidencia_delictiva) r
+    SET i.cantidad_normalizada = (i.cantidad - r.minimo) / r.rango"""
+
+
+def recalcular_columnas_derivadas(filas, cursor):
+
+    #Recalcula porcentaje_estado de los estados con registros nuevos o revisados
+    #y cantidad_normalizada de toda la tabla (un registro nuevo puede mover el min/max)
+    #Son dos UPDATE sobre conjuntos, MySQL solo escribe las filas cuyo valor cambia
+
+    estados = sorted({fila[COLUMNAS_INCIDENCIA.index("id_estado")] for fila in filas})
+    if not estados:
+        return
+
+    cursor.execute(SQL_RECALCULAR_PORCENTAJE.format(estados=", ".join(["%s"] * len(estados))), estados)
+    print(f" porcentaje_estado recalculado: {cursor.rowcount} registros de {len(estados)} estados")
+
+    cursor.execute(SQL_RECALCULAR_NORMALIZADA)
+    print(f" cantidad_normalizada recalculada: {cursor.rowcount} registros")
+
+
+def insertar_incidencia_delictiva(df, modo=None, tamano_lote=None, dimensiones=None,
+                                  incremental=None):
+
+    #Inserta datos de incidencia delictiva en la base de datos
+    #modo "executemany" inserta por lotes, "load_data" usa LOAD DATA LOCAL INFILE
+    #incremental solo envia los registros nuevos o revisados y hace upsert
+
+    modo = modo or DataDB.MODO_CARGA
+    tamano_lote = tamano_lote or DataDB.TAMANO_LOTE
+    if incremental is None:
+        incremental = DataDB.CARGA_INCREMENTAL
+
+    print(f"\n=== INSERTANDO INCIDENCIA DELICTIVA ({modo}) ===")
+
+    with etapa_carga("incidencia delictiva") as (conexion, cursor):
+        if dimensiones is None:
+            dimensiones = cargar_dimensiones(cursor)
+
+        filas, registros_omitidos = preparar_filas_incidencia(
+            df, dimensiones, cursor if incremental else None)
+
+        inicio = time.perf_counter()
+
+        if modo == "load_data":
+            insertados, omitidos = cargar_con_load_data(filas, cursor, incremental)
         else:
-            registros_omitidos += 1
+            insertados, omitidos = cargar_con_executemany(filas, cursor, tamano_lote, conexion,
+                                                          incremental)
+
+        duracion = time.perf_counter() - inicio
+        registros_omitidos += omitidos
 
-    conexion.commit()
-    cursor.close()
-    conexion.close()
+        # Los registros sin cambios conservan porcentaje y normalizacion de la carga anterior
+        if incremental:
+            recalcular_columnas_derivadas(filas, cursor)
 
-    print(f" Registros insertados: {registros_insertados}")
+    print(f" Registros insertados: {insertados}")
     print(f" Registros omitidos: {registros_omitidos}")
+    if duracion > 0:
+        print(f" Velocidad de carga: {insertados / duracion:,.0f} registros/seg ({duracion:.2f} s)")
 
 
-def insertar_percepcion_seguridad(df):
+def insertar_percepcion_seguridad(df, dimensiones=None):
 
     #Inserta datos de percepción de seguridad en la base de datos
 
     print("\n=== INSERTANDO PERCEPCIÓN DE SEGURIDAD ===")
 
-    conexion = conectar()
-    if not conexion:
-        return
-
-    cursor = conexion.cursor()
-
     sql = """INSERT INTO percepcion_seguridad 
              (anio, id_estado, percepcion_inseguridad, total_delitos)
-             VALUES (%s, %s, %s, %s)"""
+             VALUES (%s, %s, %s, %s)
+             ON DUPLICATE KEY UPDATE
+                percepcion_inseguridad = VALUES(percepcion_inseguridad),
+                total_delitos = VALUES(total_delitos)"""
+
+    if dimensiones is None:
+        with etapa_carga("catálogos") as (conexion, cursor):
+            dimensiones = cargar_dimensiones(cursor)
+
+    resuelto = resolver_ids(df, dimensiones)
+    datos = resuelto[resuelto["id_estado"].notna()]
+
+    columnas = pd.DataFrame({
+        "anio": datos["anio"].astype(int),
+        "id_estado": datos["id_estado"].astype(int),
+        "percepcion_inseguridad": datos["percepcion_inseguridad"].astype(float),
+        "total_delitos": datos.get("total_delitos", 0),
+    })
+    columnas["total_delitos"] = columnas["total_delitos"].fillna(0).astype(int)
+    filas = [tuple(fila) for fila in columnas.astype(object).values.tolist()]
+
+    with etapa_carga("percepción de seguridad") as (conexion, cursor):
+        cursor.executemany(sql, filas)
+        registros_insertados = len(filas)
 
-    registros_insertados = 0
+    print(f" Registros de percepción insertados: {registros_insertados}")
 
-    for index, row in df.iterrows():
-        id_estado = obtener_id_estado(row["estado"], cursor)
-
-        if id_estado:
-            try:
-                valores = (
-                    int(row["anio"]),
-                    id_estado,
-                    float(row["percepcion_inseguridad"]),
-                    int(row.get("total_delitos", 0))
-                )
-                cursor.execute(sql, valores)
-                registros_insertados += 1
-            except Error as e:
-                print(f"Error al insertar percepción: {e}")
-
-    conexion.commit()
-    cursor.close()
-    conexion.close()
 
-    print(f" Registros de percepción insertados: {registros_insertados}")
+# Agregaciones que se materializan en estadisticas_agregadas despues de cada carga
+# El dashboard lee estas filas en lugar de agrupar incidencia_delictiva en cada consulta
+AGREGACIONES = {
+    "estado_anio": """
+        SELECT 'estado_anio', anio, NULL, id_estado, NULL, SUM(cantidad), AVG(cantidad)
+        FROM incidencia_delictiva
+        GROUP BY id_estado, anio""",
+    "estado_mes": """
+        SELECT 'estado_mes', NULL, mes_num, id_estado, NULL, SUM(cantidad), AVG(cantidad)
+        FROM incidencia_delictiva
+        GROUP BY id_estado, mes_num""",
+    "tipo_estado": """
+        SELECT 'tipo_estado', NULL, NULL, id_estado, id_tipo_delito, SUM(cantidad), AVG(cantidad)
+        FROM incidencia_delictiva
+        GROUP BY id_tipo_delito, id_estado""",
+    "tipo_total": """
+        SELECT 'tipo_total', NULL, NULL, NULL, id_tipo_delito, SUM(cantidad), AVG(cantidad)
+        FROM incidencia_delictiva
+        GROUP BY id_tipo_delito""",
+    "tipo_mes": """
+        SELECT 'tipo_mes', anio, mes_num, NULL, id_tipo_delito, SUM(cantidad), AVG(cantidad)
+        FROM incidencia_delictiva
+        GROUP BY id_tipo_delito, anio, mes_num""",
+}
+
+
+def calcular_estadisticas_agregadas():
+
+    #Recalcula la tabla estadisticas_agregadas a partir de incidencia_delictiva
+    #Se reemplazan todas las filas en una sola transacción
+
+    print("\n=== CALCULANDO ESTADISTICAS AGREGADAS ===")
+
+    sql_insertar = """INSERT INTO estadisticas_agregadas
+                      (tipo_agregacion, anio, mes_num, id_estado, id_tipo_delito,
+                       total_delitos, promedio_delitos) """
+
+    with etapa_carga("estadísticas agregadas") as (conexion, cursor):
+        cursor.execute("DELETE FROM estadisticas_agregadas")
+
+        for tipo_agregacion, sql_select in AGREGACIONES.items():
+            cursor.execute(sql_insertar + sql_select)
+            print(f"  {tipo_agregacion}: {cursor.rowcount} registros")
 
 
 def leer_datos_transformados():
 
-    #Lee los datos transformados desde los archivos CSV
+    #Lee los datos transformados desde dataset/ (CSV o Parquet)
 
     print("\n=== LEYENDO DATOS TRANSFORMADOS ===")
 
     try:
-        df_delitos = pd.read_csv("dataset/delitos_transformados.csv", encoding='utf-8')
-        df_percepcion = pd.read_csv("dataset/percepcion_seguridad.csv", encoding='utf-8')
+        df_delitos = leer_tabla("delitos_transformados", esquema=ESQUEMA_INCIDENCIA)
+        df_percepcion = leer_tabla("percepcion_seguridad")
 
         print(f"Datos de delitos cargados: {len(df_delitos)} registros")
+        reportar_memoria(df_delitos, "carga")
         print(f"Datos de percepción cargados: {len(df_percepcion)} registros")
 
         return df_delitos, df_percepcion
@@ -238,12 +538,6 @@ def verificar_carga():
 
     print("\n=== VERIFICANDO CARGA DE DATOS ===")
 
-    conexion = conectar()
-    if not conexion:
-        return
-
-    cursor = conexion.cursor()
-
     # Contar registros en cada tabla
     tablas = [
         "estados",
@@ -252,14 +546,24 @@ def verificar_carga():
         "percepcion_seguridad"
     ]
 
-    for tabla in tablas:
-        sql = f"SELECT COUNT(*) FROM {tabla}"
-        cursor.execute(sql)
-        count = cursor.fetchone()[0]
-        print(f"  {tabla}: {count} registros")
+    with etapa_carga("verificación") as (conexion, cursor):
+        for tabla in tablas:
+            sql = f"SELECT COUNT(*) FROM {tabla}"
+            cursor.execute(sql)
+            count = cursor.fetchone()[0]
+            print(f"  {tabla}: {count} registros")
+
 
-    cursor.close()
-    conexion.close()
+def registrar_version_carga():
+
+    #Registra una nueva version de carga en la tabla version_carga
+    #El dashboard la usa para invalidar su cache de consultas
+
+    with etapa_carga("versión de carga") as (conexion, cursor):
+        cursor.execute("SELECT COUNT(*) FROM incidencia_delictiva")
+        registros = cursor.fetchone()[0]
+        cursor.execute("INSERT INTO version_carga (registros) VALUES (%s)", (registros,))
+        print(f" Versión de carga registrada: {cursor.lastrowid}")
 
 
 def main():
@@ -279,17 +583,29 @@ def main():
 
         return
 
-    #  Insertar tipos de delito
-    insertar_tipos_delito(df_delitos)
+    try:
+        #  Insertar estados y tipos de delito (retorna los catalogos para reutilizarlos)
+        dimensiones = insertar_dimensiones(df_delitos, df_percepcion)
+
+        #  Insertar incidencia delictiva
+        insertar_incidencia_delictiva(df_delitos, dimensiones=dimensiones)
 
-    #  Insertar incidencia delictiva
-    insertar_incidencia_delictiva(df_delitos)
+        #  Insertar percepcion de seguridad
+        insertar_percepcion_seguridad(df_percepcion, dimensiones=dimensiones)
 
-    #  Insertar percepcion de seguridad
-    insertar_percepcion_seguridad(df_percepcion)
+        #  Materializar las agregaciones que consulta el dashboard
+        calcular_estadisticas_agregadas()
 
-    #  Verificar carga
-    verificar_carga()
+        #  Verificar carga
+        verificar_carga()
+
+        #  Registrar la version para invalidar la cache del dashboard
+        registrar_version_carga()
+
+    except Error as e:
+        print(f"\n Error durante la carga: {e}")
+        print(" La etapa que falló fue revertida")
+        return
 
     print("\n" + "=" * 60)
     print(" CARGA DE DATOS COMPLETADA")
@@ -1,9 +1,31 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from dash import Dash, html, dcc, Input, Output
+from flask import Response, request
 import dash_bootstrap_components as dbc
 from sqlalchemy import create_engine
+import almacen_dashboard
+from esquema_datos import MESES
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+try:
+    import flask_compress
+except ImportError:
+    flask_compress = None
 
 
 class DataDB:
@@ -14,6 +36,38 @@ class DataDB:
     SERVER = "localhost"
     PORT = "3306"
 
+    #Configuración del pool de conexiones (QueuePool)
+    POOL_SIZE = 5
+    POOL_MAX_OVERFLOW = 10
+    POOL_TIMEOUT = 30
+    POOL_RECYCLE = 1800
+
+    #Configuración de la cache de consultas
+    CACHE_TTL = 600            # segundos que se conserva un resultado
+    CACHE_MAX_ENTRADAS = 128
+    CACHE_DIRECTORIO = None    # ej. "cache_dashboard" para compartirla entre workers (requiere diskcache)
+    VERSION_TTL = 30           # segundos entre revisiones de la version de carga
+
+    #Origen de los datos de las graficas
+    MODO_DATOS = "mysql"       # "mysql" (consultas con cache) o "memoria" (almacen columnar, sin MySQL por peticion)
+    ORIGEN_MEMORIA = "mysql"   # de donde se carga el almacen: "mysql" o "archivos" (dataset/)
+
+    #Envio de las figuras
+    FIGURAS_HTTP = True        # el navegador pide cada figura a /figuras/<consulta> y la revalida con ETag
+    UMBRAL_WEBGL = 500         # puntos a partir de los cuales las lineas y dispersiones usan WebGL
+
+    #Servidor de produccion (python -m dashboard serve, requiere gunicorn)
+    SERVIDOR_HOST = "0.0.0.0"
+    SERVIDOR_PUERTO = 8050
+    SERVIDOR_WORKERS = 4
+    SERVIDOR_HILOS = 4
+    CACHE_DIRECTORIO_SERVIDOR = "cache_dashboard"   # cache en disco compartida por los workers
+
+
+_engine = None
+_candado_engine = threading.Lock()
+_espera_conexiones = {"conexiones": 0, "espera_total": 0.0, "espera_maxima": 0.0}
+
 
 def crear_engine():
     """
@@ -21,45 +75,444 @@ def crear_engine():
     """
     try:
         cadena_conexion = f"mysql+mysqlconnector://{DataDB.USER}:{DataDB.PASSWORD}@{DataDB.SERVER}:{DataDB.PORT}/{DataDB.NAME_BD}"
-        engine = create_engine(cadena_conexion)
+        engine = create_engine(
+            cadena_conexion,
+            pool_size=DataDB.POOL_SIZE,
+            max_overflow=DataDB.POOL_MAX_OVERFLOW,
+            pool_timeout=DataDB.POOL_TIMEOUT,
+            pool_recycle=DataDB.POOL_RECYCLE,
+            pool_pre_ping=True
+        )
         return engine
     except Exception as e:
         print(f"Error al crear engine: {e}")
         return None
 
 
-def obtener_datos_bd(query):
+def obtener_engine():
+    """
+    Retorna el engine compartido, se crea la primera vez que se usa
+    """
+    global _engine
+
+    if _engine is None:
+        with _candado_engine:
+            if _engine is None:
+                _engine = crear_engine()
+
+    return _engine
+
+
+def registrar_espera_conexion(segundos):
+    """
+    Acumula el tiempo que se espero para obtener una conexion del pool
+    """
+    with _candado_engine:
+        _espera_conexiones["conexiones"] += 1
+        _espera_conexiones["espera_total"] += segundos
+        _espera_conexiones["espera_maxima"] = max(_espera_conexiones["espera_maxima"], segundos)
+
+
+def estadisticas_pool():
+    """
+    Retorna el estado del pool y los tiempos de espera por conexion
+    """
+    with _candado_engine:
+        estadisticas = dict(_espera_conexiones)
+
+    conexiones = estadisticas["conexiones"]
+    estadisticas["espera_promedio"] = estadisticas["espera_total"] / conexiones if conexiones else 0.0
+    estadisticas["pool"] = _engine.pool.status() if _engine is not None else "sin crear"
+
+    return estadisticas
+
+
+_cache_consultas = OrderedDict()
+_candado_cache = threading.Lock()
+_cache_disco = None
+_version_carga = {"valor": None, "revisada": 0.0, "ok": False}
+
+
+def obtener_cache_disco():
+    """
+    Retorna la cache en disco compartida entre procesos, si esta configurada
+    """
+    global _cache_disco
+
+    if _cache_disco is None and DataDB.CACHE_DIRECTORIO and diskcache is not None:
+        _cache_disco = diskcache.Cache(DataDB.CACHE_DIRECTORIO)
+
+    return _cache_disco
+
+
+def obtener_version_carga():
+    """
+    Retorna la ultima version registrada por carga_bd en la tabla version_carga
+    Solo se consulta MySQL cada DataDB.VERSION_TTL segundos
+    Si la consulta funciono queda en _version_carga["ok"] (False sin engine o si MySQL fallo)
+    """
+    ahora = time.monotonic()
+
+    if ahora - _version_carga["revisada"] < DataDB.VERSION_TTL:
+        return _version_carga["valor"]
+
+    version = _version_carga["valor"]
+    engine = obtener_engine()
+    consultada = False
+
+    if engine:
+        try:
+            with engine.connect() as conexion:
+                version = pd.read_sql("SELECT MAX(id_version) AS version FROM version_carga",
+                                      conexion)["version"].iloc[0]
+            consultada = True
+        except Exception as e:
+            print(f"Error al consultar version de carga: {e}")
+
+    if version != _version_carga["valor"]:
+        # Hubo una carga nueva: los resultados anteriores ya no sirven
+        limpiar_cache()
+
+    _version_carga["valor"] = version
+    _version_carga["revisada"] = ahora
+    _version_carga["ok"] = consultada
+
+    return version
+
+
+def clave_cache(query, params=None):
+    """
+    Genera la clave de cache a partir del SQL, los parametros y la version de carga
+    """
+    texto = f"{obtener_version_carga()}|{query}|{params!r}"
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def leer_cache(clave):
+    """
+    Busca un resultado en la cache en memoria y despues en la de disco
+    """
+    with _candado_cache:
+        entrada = _cache_consultas.get(clave)
+        if entrada is not None:
+            guardado, df = entrada
+            if time.monotonic() - guardado < DataDB.CACHE_TTL:
+                _cache_consultas.move_to_end(clave)
+                return df
+            del _cache_consultas[clave]
+
+    cache_disco = obtener_cache_disco()
+    if cache_disco is not None:
+        df = cache_disco.get(clave)
+        if df is not None:
+            guardar_cache(clave, df, en_disco=False)
+            return df
+
+    return None
+
+
+def guardar_cache(clave, df, en_disco=True):
+    """
+    Guarda un resultado en la cache LRU en memoria (y en disco si esta configurada)
+    """
+    with _candado_cache:
+        _cache_consultas[clave] = (time.monotonic(), df)
+        _cache_consultas.move_to_end(clave)
+        while len(_cache_consultas) > DataDB.CACHE_MAX_ENTRADAS:
+            _cache_consultas.popitem(last=False)
+
+    cache_disco = obtener_cache_disco()
+    if en_disco and cache_disco is not None:
+        cache_disco.set(clave, df, expire=DataDB.CACHE_TTL)
+
+
+def limpiar_cache():
+    """
+    Elimina todos los resultados guardados
+    """
+    with _candado_cache:
+        _cache_consultas.clear()
+
+    cache_disco = obtener_cache_disco()
+    if cache_disco is not None:
+        cache_disco.clear()
+
+
+def obtener_datos_bd(query, params=None):
     """
     Ejecuta una consulta y retorna un DataFrame usando SQLAlchemy
+    Los resultados se guardan en cache hasta que carga_bd registra una nueva carga
     """
-    engine = crear_engine()
+    clave = clave_cache(query, params)
+    df = leer_cache(clave)
+    if df is not None:
+        return df.copy()
+
+    engine = obtener_engine()
     if not engine:
         return None
 
     try:
-        df = pd.read_sql(query, engine)
-        return df
+        inicio = time.perf_counter()
+        with engine.connect() as conexion:
+            registrar_espera_conexion(time.perf_counter() - inicio)
+            df = pd.read_sql(query, conexion, params=params)
+        guardar_cache(clave, df)
+        return df.copy()
     except Exception as e:
         print(f"Error al ejecutar query: {e}")
         return None
 
 
-def crear_grafica_incidencia():
-    """
-    Grafica 1: Incidencia delictiva por estado
-    """
-    query = """
+# Consultas de cada grafica, se ejecutan en paralelo en obtener_datos_concurrente
+# Leen las filas precalculadas por carga_bd en estadisticas_agregadas
+CONSULTAS = {
+    "incidencia": """
     SELECT 
         e.nombre as estado,
-        i.anio,
-        SUM(i.cantidad) as total_delitos
-    FROM incidencia_delictiva i
-    JOIN estados e ON i.id_estado = e.id_estado
-    GROUP BY e.nombre, i.anio
-    ORDER BY i.anio, total_delitos DESC
+        a.anio,
+        a.total_delitos
+    FROM estadisticas_agregadas a
+    JOIN estados e ON a.id_estado = e.id_estado
+    WHERE a.tipo_agregacion = 'estado_anio'
+    ORDER BY a.anio, a.total_delitos DESC
+    """,
+    "tipos_delito": """
+    SELECT 
+        t.categoria as tipo_delito,
+        e.nombre as estado,
+        SUM(a.total_delitos) as total
+    FROM estadisticas_agregadas a
+    JOIN tipos_delito t ON a.id_tipo_delito = t.id_tipo_delito
+    JOIN estados e ON a.id_estado = e.id_estado
+    WHERE a.tipo_agregacion = 'tipo_estado' AND t.categoria IS NOT NULL
+    GROUP BY t.categoria, e.nombre
+    ORDER BY total DESC
+    """,
+    "promedio_mensual": """
+    SELECT 
+        e.nombre as estado,
+        ELT(a.mes_num, 'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+            'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre') as mes,
+        a.mes_num,
+        a.promedio_delitos as promedio
+    FROM estadisticas_agregadas a
+    JOIN estados e ON a.id_estado = e.id_estado
+    WHERE a.tipo_agregacion = 'estado_mes'
+    ORDER BY a.mes_num
+    """,
+    "evolucion": """
+    SELECT 
+        CONCAT(a.anio, '-', LPAD(a.mes_num, 2, '0')) as fecha,
+        t.nombre as tipo_delito,
+        SUM(a.total_delitos) as total
+    FROM estadisticas_agregadas a
+    JOIN tipos_delito t ON a.id_tipo_delito = t.id_tipo_delito
+    WHERE a.tipo_agregacion = 'tipo_mes' AND t.nombre IN ('Homicidio', 'Secuestro')
+    GROUP BY a.anio, a.mes_num, t.nombre
+    ORDER BY a.anio, a.mes_num
+    """,
+    "distribucion": """
+    SELECT 
+        t.nombre as tipo_delito,
+        SUM(a.total_delitos) as total
+    FROM estadisticas_agregadas a
+    JOIN tipos_delito t ON a.id_tipo_delito = t.id_tipo_delito
+    WHERE a.tipo_agregacion = 'tipo_total'
+    GROUP BY t.nombre
+    ORDER BY total DESC
+    """,
+    "percepcion": """
+    SELECT 
+        e.nombre as estado,
+        a.anio,
+        a.total_delitos,
+        p.percepcion_inseguridad
+    FROM estadisticas_agregadas a
+    JOIN estados e ON a.id_estado = e.id_estado
+    JOIN percepcion_seguridad p ON a.id_estado = p.id_estado AND a.anio = p.anio
+    WHERE a.tipo_agregacion = 'estado_anio'
+    ORDER BY a.anio, e.nombre
+    """,
+}
+
+
+_almacen = None
+_candado_almacen = threading.Lock()
+_refresco_almacen = {"pid": None}
+
+
+def version_almacen():
+    """
+    Version de los datos del almacen en memoria: la de version_carga o la de los archivos
+    """
+    if DataDB.ORIGEN_MEMORIA == "archivos":
+        return almacen_dashboard.version_archivos()
+    return obtener_version_carga()
+
+
+def cargar_almacen(version):
+    """
+    Carga el almacen columnar desde el origen configurado
+    """
+    inicio = time.perf_counter()
+
+    if DataDB.ORIGEN_MEMORIA == "archivos":
+        almacen = almacen_dashboard.cargar_desde_archivos(version)
+    else:
+        almacen = almacen_dashboard.cargar_desde_mysql(obtener_engine(), version)
+
+    print(f"Almacen en memoria cargado: {almacen.registros} registros, version {version} "
+          f"({(time.perf_counter() - inicio) * 1000:.1f} ms)")
+    return almacen
+
+
+def refrescar_almacen():
+    """
+    Recarga el almacen si hay una version nueva; el almacen anterior se reemplaza
+    completo, asi las peticiones en curso siguen usando una version consistente
+    """
+    global _almacen
+
+    version = version_almacen()
+    if _almacen is not None and version == _almacen.version:
+        return _almacen
+
+    with _candado_almacen:
+        if _almacen is None or version != _almacen.version:
+            try:
+                _almacen = cargar_almacen(version)
+            except Exception as e:
+                print(f"Error al cargar el almacen en memoria: {e}")
+
+    return _almacen
+
+
+def revisar_version_almacen():
+    # Hilo de fondo: revisa la version cada DataDB.VERSION_TTL segundos
+    while True:
+        time.sleep(DataDB.VERSION_TTL)
+        refrescar_almacen()
+
+
+def opciones_filtro(etiquetas):
+    """
+    Opciones de un Dropdown a partir de las etiquetas de un eje del almacen
+    """
+    return [{"label": str(etiqueta), "value": etiqueta.item() if hasattr(etiqueta, "item") else etiqueta}
+            for etiqueta in etiquetas if etiqueta is not None and not pd.isna(etiqueta)]
+
+
+def obtener_almacen():
+    """
+    Retorna el almacen en memoria; la primera vez en cada proceso lo carga
+    e inicia el hilo que lo refresca, fuera del camino de las peticiones
+    """
+    if _refresco_almacen["pid"] != os.getpid():
+        with _candado_almacen:
+            if _refresco_almacen["pid"] != os.getpid():
+                _refresco_almacen["pid"] = os.getpid()
+                threading.Thread(target=revisar_version_almacen, name="refresco_almacen",
+                                 daemon=True).start()
+
+    return _almacen if _almacen is not None else refrescar_almacen()
+
+
+_latencias_callback = deque(maxlen=1000)
+_candado_latencias = threading.Lock()
+
+
+def registrar_latencia(segundos):
+    """
+    Guarda la duracion de un callback (o de una figura) y retorna (p50, p95) en ms de las ultimas ejecuciones
+    """
+    with _candado_latencias:
+        _latencias_callback.append(segundos)
+        latencias = np.array(_latencias_callback) * 1000
+
+    return np.percentile(latencias, 50), np.percentile(latencias, 95)
+
+
+_executor_consultas = ThreadPoolExecutor(max_workers=DataDB.POOL_SIZE,
+                                         thread_name_prefix="consultas")
+
+
+def medir_consulta(nombre):
+    """
+    Ejecuta una consulta de CONSULTAS y retorna su resultado con la duracion
+    """
+    inicio = time.perf_counter()
+    df = obtener_datos_bd(CONSULTAS[nombre])
+    return nombre, df, time.perf_counter() - inicio
+
+
+def obtener_datos_concurrente(nombres=None):
+    """
+    Ejecuta varias consultas al mismo tiempo sobre el pool de conexiones
+    Genera (nombre, DataFrame) conforme termina cada consulta y registra su tiempo
+    """
+    nombres = list(nombres or CONSULTAS)
+    inicio = time.perf_counter()
+    tiempos = {}
+
+    futuros = [_executor_consultas.submit(medir_consulta, nombre) for nombre in nombres]
+
+    for futuro in as_completed(futuros):
+        nombre, df, duracion = futuro.result()
+        tiempos[nombre] = duracion
+        print(f"  Consulta {nombre}: {duracion * 1000:.1f} ms")
+        yield nombre, df
+
+    total = time.perf_counter() - inicio
+    if tiempos:
+        mas_lenta = max(tiempos, key=tiempos.get)
+        print(f"  Consultas completadas en {total * 1000:.1f} ms "
+              f"(ruta critica: {mas_lenta}, {tiempos[mas_lenta] * 1000:.1f} ms)")
+
+
+def modo_render(df):
+    """
+    Con muchos puntos las lineas y dispersiones se dibujan con WebGL en lugar de SVG
+    """
+    return "webgl" if len(df) > DataDB.UMBRAL_WEBGL else "svg"
+
+
+def compactar_arreglo(valores):
+    """
+    Convierte valores numericos al tipo NumPy mas chico posible
+    Plotly serializa los arreglos NumPy como binario base64 (dtype + bdata) en lugar de listas
+    """
+    if valores is None or isinstance(valores, (str, dict)):
+        return valores
+
+    arreglo = np.asarray(valores)
+    if arreglo.dtype.kind in "iu":
+        return pd.to_numeric(arreglo, downcast="integer")
+    if arreglo.dtype.kind == "f":
+        return arreglo.astype(np.float32)
+    return valores
+
+
+def compactar_figura(fig):
     """
+    Compacta las columnas numericas de cada traza (x, y, values y tamaño de marcador)
+    """
+    for traza in fig.data:
+        for atributo in ("x", "y", "values"):
+            if atributo in traza:
+                traza[atributo] = compactar_arreglo(traza[atributo])
+        if "marker" in traza and "size" in traza.marker and traza.marker.size is not None:
+            traza.marker.size = compactar_arreglo(traza.marker.size)
+
+    return fig
+
 
-    df = obtener_datos_bd(query)
+def crear_grafica_incidencia(df=None):
+    """
+    Grafica 1: Incidencia delictiva por estado
+    """
+    if df is None:
+        df = obtener_datos_bd(CONSULTAS["incidencia"])
 
     if df is None or df.empty:
         return go.Figure()
@@ -77,27 +530,15 @@ def crear_grafica_incidencia():
         height=400
     )
 
-    return fig
+    return compactar_figura(fig)
 
 
-def crear_grafica_tipos_delito():
+def crear_grafica_tipos_delito(df=None):
     """
     Grafica 2: Tipos de delitos por estado
     """
-    query = """
-    SELECT 
-        t.categoria as tipo_delito,
-        e.nombre as estado,
-        SUM(i.cantidad) as total
-    FROM incidencia_delictiva i
-    JOIN tipos_delito t ON i.id_tipo_delito = t.id_tipo_delito
-    JOIN estados e ON i.id_estado = e.id_estado
-    WHERE t.categoria IS NOT NULL
-    GROUP BY t.categoria, e.nombre
-    ORDER BY total DESC
-    """
-
-    df = obtener_datos_bd(query)
+    if df is None:
+        df = obtener_datos_bd(CONSULTAS["tipos_delito"])
 
     if df is None or df.empty:
         return go.Figure()
@@ -116,26 +557,15 @@ def crear_grafica_tipos_delito():
         xaxis_tickangle=-45
     )
 
-    return fig
+    return compactar_figura(fig)
 
 
-def crear_grafica_promedio_mensual():
+def crear_grafica_promedio_mensual(df=None):
     """
     Grafica 3: Promedio mensual de delitos
     """
-    query = """
-    SELECT 
-        e.nombre as estado,
-        i.mes,
-        i.mes_num,
-        AVG(i.cantidad) as promedio
-    FROM incidencia_delictiva i
-    JOIN estados e ON i.id_estado = e.id_estado
-    GROUP BY e.nombre, i.mes, i.mes_num
-    ORDER BY i.mes_num
-    """
-
-    df = obtener_datos_bd(query)
+    if df is None:
+        df = obtener_datos_bd(CONSULTAS["promedio_mensual"])
 
     if df is None or df.empty:
         return go.Figure()
@@ -144,6 +574,7 @@ def crear_grafica_promedio_mensual():
                   title="Promedio Mensual de Delitos por Estado",
                   labels={"promedio": "Promedio de Delitos", "mes": "Mes"},
                   markers=True,
+                  render_mode=modo_render(df),
                   color_discrete_sequence=["#3498db", "#2ecc71", "#f39c12"])
 
     fig.update_layout(
@@ -154,26 +585,15 @@ def crear_grafica_promedio_mensual():
         xaxis_tickangle=-45
     )
 
-    return fig
+    return compactar_figura(fig)
 
 
-def crear_grafica_evolucion():
+def crear_grafica_evolucion(df=None):
     """
     Grafica 4: Evolucion temporal de delitos graves
     """
-    query = """
-    SELECT 
-        i.fecha,
-        t.nombre as tipo_delito,
-        SUM(i.cantidad) as total
-    FROM incidencia_delictiva i
-    JOIN tipos_delito t ON i.id_tipo_delito = t.id_tipo_delito
-    WHERE t.nombre IN ('Homicidio', 'Secuestro')
-    GROUP BY i.fecha, t.nombre
-    ORDER BY i.fecha
-    """
-
-    df = obtener_datos_bd(query)
+    if df is None:
+        df = obtener_datos_bd(CONSULTAS["evolucion"])
 
     if df is None or df.empty:
         return go.Figure()
@@ -184,6 +604,7 @@ def crear_grafica_evolucion():
                   title="Evolución Temporal de Delitos Graves",
                   labels={"total": "Total de Delitos", "fecha": "Fecha"},
                   markers=True,
+                  render_mode=modo_render(df),
                   color_discrete_sequence=["#e74c3c", "#9b59b6"])
 
     fig.update_layout(
@@ -193,24 +614,15 @@ def crear_grafica_evolucion():
         height=400
     )
 
-    return fig
+    return compactar_figura(fig)
 
 
-def crear_grafica_distribucion():
+def crear_grafica_distribucion(df=None):
     """
     Grafica 5: Distribucion de tipos de delitos
     """
-    query = """
-    SELECT 
-        t.nombre as tipo_delito,
-        SUM(i.cantidad) as total
-    FROM incidencia_delictiva i
-    JOIN tipos_delito t ON i.id_tipo_delito = t.id_tipo_delito
-    GROUP BY t.nombre
-    ORDER BY total DESC
-    """
-
-    df = obtener_datos_bd(query)
+    if df is None:
+        df = obtener_datos_bd(CONSULTAS["distribucion"])
 
     if df is None or df.empty:
         return go.Figure()
@@ -226,34 +638,22 @@ def crear_grafica_distribucion():
         height=400
     )
 
-    return fig
+    return compactar_figura(fig)
 
 
-def crear_grafica_percepcion():
+def crear_grafica_percepcion(df=None):
     """
     Grafica 6: Relacion entre delitos y percepcion
     """
-    query = """
-    SELECT 
-        e.nombre as estado,
-        inc.anio,
-        SUM(inc.cantidad) as total_delitos,
-        p.percepcion_inseguridad
-    FROM estados e
-    JOIN incidencia_delictiva inc ON e.id_estado = inc.id_estado
-    JOIN percepcion_seguridad p ON e.id_estado = p.id_estado AND inc.anio = p.anio
-    JOIN tipos_delito t ON inc.id_tipo_delito = t.id_tipo_delito
-    GROUP BY e.nombre, inc.anio, p.percepcion_inseguridad
-    ORDER BY inc.anio, e.nombre
-    """
-
-    df = obtener_datos_bd(query)
+    if df is None:
+        df = obtener_datos_bd(CONSULTAS["percepcion"])
 
     if df is None or df.empty:
         return go.Figure()
 
     fig = px.scatter(df, x="total_delitos", y="percepcion_inseguridad",
                      color="estado", size="total_delitos",
+                     render_mode=modo_render(df),
                      title="Relación entre Delitos y Percepción de Inseguridad",
                      labels={"total_delitos": "Total de Delitos",
                              "percepcion_inseguridad": "Percepción de Inseguridad (%)"},
@@ -266,14 +666,19 @@ def crear_grafica_percepcion():
         height=400
     )
 
-    return fig
+    return compactar_figura(fig)
 
 
 # Crear aplicacion Dash
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+# Con flask-compress instalado las respuestas (figuras y callbacks) se envian comprimidas
+app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], compress=flask_compress is not None)
 
 # Layout de la aplicacion
+# Las graficas se generan al cargar la pagina (en /figuras/<consulta> o en el callback actualizar_graficas),
+# asi el arranque no depende de MySQL y se reflejan las cargas nuevas sin reiniciar
 app.layout = html.Div([
+    dcc.Location(id="url"),
+
     # Encabezado
     html.Div([
         html.H1("Análisis de Violencia y Seguridad Pública en México",
@@ -322,37 +727,58 @@ app.layout = html.Div([
         html.H2("Dashboard Interactivo",
                 style={"textAlign": "center", "color": "#34495e", "marginTop": "30px"}),
 
+        # Filtros: se aplican a las seis graficas y se calculan con el cubo en memoria
+        dbc.Row([
+            dbc.Col([
+                html.Label("Estado"),
+                dcc.Dropdown(id="filtro-estado", multi=True, placeholder="Todos")
+            ], width=3),
+            dbc.Col([
+                html.Label("Año"),
+                dcc.Dropdown(id="filtro-anio", multi=True, placeholder="Todos")
+            ], width=2),
+            dbc.Col([
+                html.Label("Categoría"),
+                dcc.Dropdown(id="filtro-categoria", multi=True, placeholder="Todas")
+            ], width=3),
+            dbc.Col([
+                html.Label("Meses"),
+                dcc.RangeSlider(id="filtro-meses", min=1, max=12, step=1, value=[1, 12],
+                                marks={numero: mes[:3] for numero, mes in enumerate(MESES, start=1)})
+            ], width=4),
+        ], style={"marginTop": "20px"}),
+
         # Fila 1: Graficas 1 y 2
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id="grafica-incidencia", figure=crear_grafica_incidencia())
+                dcc.Graph(id="grafica-incidencia")
             ], width=6),
             dbc.Col([
-                dcc.Graph(id="grafica-tipos", figure=crear_grafica_tipos_delito())
+                dcc.Graph(id="grafica-tipos")
             ], width=6),
         ], style={"marginTop": "20px"}),
 
         # Fila 2: Grafica 3
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id="grafica-promedio", figure=crear_grafica_promedio_mensual())
+                dcc.Graph(id="grafica-promedio")
             ], width=12),
         ], style={"marginTop": "20px"}),
 
         # Fila 3: Graficas 4 y 5
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id="grafica-evolucion", figure=crear_grafica_evolucion())
+                dcc.Graph(id="grafica-evolucion")
             ], width=6),
             dbc.Col([
-                dcc.Graph(id="grafica-distribucion", figure=crear_grafica_distribucion())
+                dcc.Graph(id="grafica-distribucion")
             ], width=6),
         ], style={"marginTop": "20px"}),
 
         # Fila 4: Grafica 6
         dbc.Row([
             dbc.Col([
-                dcc.Graph(id="grafica-percepcion", figure=crear_grafica_percepcion())
+                dcc.Graph(id="grafica-percepcion")
             ], width=12),
         ], style={"marginTop": "20px"}),
     ], style={"padding": "20px"}),
@@ -440,8 +866,366 @@ app.layout = html.Div([
                style={"textAlign": "center", "color": "#7f8c8d", "padding": "20px"})
     ])
 ], style={"fontFamily": "Arial, sans-serif", "backgroundColor": "#ffffff"})
+
+
+# Graficas del dashboard: id del componente, consulta y funcion que genera la figura
+GRAFICAS = [
+    ("grafica-incidencia", "incidencia", crear_grafica_incidencia),
+    ("grafica-tipos", "tipos_delito", crear_grafica_tipos_delito),
+    ("grafica-promedio", "promedio_mensual", crear_grafica_promedio_mensual),
+    ("grafica-evolucion", "evolucion", crear_grafica_evolucion),
+    ("grafica-distribucion", "distribucion", crear_grafica_distribucion),
+    ("grafica-percepcion", "percepcion", crear_grafica_percepcion),
+]
+
+
+@app.callback(
+    [Output("filtro-estado", "options"),
+     Output("filtro-anio", "options"),
+     Output("filtro-categoria", "options")],
+    Input("url", "pathname")
+)
+def cargar_opciones_filtros(_):
+    """
+    Llena los filtros con los valores del almacen en memoria
+    """
+    almacen = obtener_almacen()
+    if almacen is None:
+        return [], [], []
+
+    return [opciones_filtro(almacen.etiquetas[eje]) for eje in ("estado", "anio", "categoria_delito")]
+
+
+def leer_filtros(estados=None, anios=None, categorias=None, meses=None):
+    """
+    Arma el diccionario de filtros que usa el almacen en memoria
+    """
+    return {"estado": estados, "anio": anios, "categoria_delito": categorias, "meses": meses}
+
+
+def obtener_datos_graficas(consultas, filtros=None):
+    """
+    Genera (consulta, DataFrame) para las graficas
+    En modo mysql y sin filtros lanza las consultas en paralelo; en modo memoria
+    o con filtros las agregaciones salen del cubo en memoria
+    """
+    if DataDB.MODO_DATOS == "memoria" or almacen_dashboard.filtros_activos(filtros):
+        almacen = obtener_almacen()
+        resultados = almacen.consultar_filtrado(consultas, filtros) if almacen is not None else {}
+        return ((consulta, resultados.get(consulta)) for consulta in consultas)
+
+    return obtener_datos_concurrente(consultas)
+
+
+def version_datos(filtros=None):
+    """
+    Version de los datos con que se arman las figuras, para las ETag
+    """
+    if DataDB.MODO_DATOS == "memoria" or almacen_dashboard.filtros_activos(filtros):
+        almacen = obtener_almacen()
+        return almacen.version if almacen is not None else None
+    return obtener_version_carga()
+
+
+ENTRADAS_GRAFICAS = [
+    Input("url", "pathname"),
+    Input("filtro-estado", "value"),
+    Input("filtro-anio", "value"),
+    Input("filtro-categoria", "value"),
+    Input("filtro-meses", "value"),
+]
+
+
+@app.server.route("/figuras/<consulta>")
+def servir_figura(consulta):
+    """
+    Figura de una grafica en JSON con ETag (version de los datos, consulta y filtros)
+    Si el navegador ya tiene esa version responde 304 sin volver a armar ni enviar la figura
+    """
+    funciones = {nombre: crear_grafica for _, nombre, crear_grafica in GRAFICAS}
+    if consulta not in funciones:
+        return Response(status=404)
+
+    meses = [int(mes) for mes in request.args.getlist("meses")]
+    filtros = leer_filtros(request.args.getlist("estado"),
+                           [int(anio) for anio in request.args.getlist("anio")],
+                           request.args.getlist("categoria_delito"),
+                           meses if len(meses) == 2 else None)
+
+    inicio = time.perf_counter()
+    canonicos = {eje: sorted(valores) if valores and eje != "meses" else valores
+                 for eje, valores in filtros.items()}
+    texto = f"{version_datos(filtros)}|{consulta}|{json.dumps(canonicos, sort_keys=True)}"
+    etag = hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        respuesta = Response(status=304)
+    else:
+        figura = leer_cache(etag)
+        if figura is None:
+            _, df = next(iter(obtener_datos_graficas([consulta], filtros)))
+            if df is None:
+                # Sin datos (fallo la consulta o no hay almacen): no se guarda ni se envia ETag,
+                # para que la siguiente peticion vuelva a consultar
+                respuesta = Response(funciones[consulta](pd.DataFrame()).to_json(),
+                                     status=503, mimetype="application/json")
+                respuesta.headers["Cache-Control"] = "no-store"
+                return respuesta
+            figura = funciones[consulta](df).to_json()
+            guardar_cache(etag, figura)
+        respuesta = Response(figura, mimetype="application/json")
+
+    respuesta.set_etag(etag)
+    respuesta.headers["Cache-Control"] = "no-cache"
+
+    duracion = time.perf_counter() - inicio
+    p50, p95 = registrar_latencia(duracion)
+    print(f"  Figura {consulta} ({respuesta.status_code}): {duracion * 1000:.1f} ms "
+          f"(p50 {p50:.1f} ms, p95 {p95:.1f} ms)")
+
+    return respuesta
+
+
+if DataDB.FIGURAS_HTTP:
+    # El navegador pide las seis figuras con fetch; cache "no-cache" revalida con If-None-Match,
+    # asi las figuras sin cambios llegan como 304 y se toman de la cache del navegador
+    app.clientside_callback(
+        """
+        function(pathname, estados, anios, categorias, meses) {
+            const parametros = new URLSearchParams();
+            (estados || []).forEach(valor => parametros.append("estado", valor));
+            (anios || []).forEach(valor => parametros.append("anio", valor));
+            (categorias || []).forEach(valor => parametros.append("categoria_delito", valor));
+            (meses || []).forEach(valor => parametros.append("meses", valor));
+
+            return Promise.all(%s.map(consulta =>
+                fetch("/figuras/" + consulta + "?" + parametros.toString(), {cache: "no-cache"})
+                    .then(respuesta => respuesta.json())
+            ));
+        }
+        """ % json.dumps([consulta for _, consulta, _ in GRAFICAS]),
+        [Output(id_grafica, "figure") for id_grafica, _, _ in GRAFICAS],
+        ENTRADAS_GRAFICAS
+    )
+else:
+    @app.callback(
+        [Output(id_grafica, "figure") for id_grafica, _, _ in GRAFICAS],
+        ENTRADAS_GRAFICAS
+    )
+    def actualizar_graficas(_, estados, anios, categorias, meses):
+        """
+        Arma las seis figuras al cargar la pagina y cada vez que cambia un filtro
+        """
+        inicio = time.perf_counter()
+        funciones = {consulta: crear_grafica for _, consulta, crear_grafica in GRAFICAS}
+        figuras = {}
+        filtros = leer_filtros(estados, anios, categorias, meses)
+
+        for consulta, df in obtener_datos_graficas(funciones, filtros):
+            figuras[consulta] = funciones[consulta](df if df is not None else pd.DataFrame())
+
+        duracion = time.perf_counter() - inicio
+        p50, p95 = registrar_latencia(duracion)
+        print(f"  Callback actualizar_graficas: {duracion * 1000:.1f} ms "
+              f"(p50 {p50:.1f} ms, p95 {p95:.1f} ms)")
+
+        return [figuras[consulta] for _, consulta, _ in GRAFICAS]
+
+
+_estado_servidor = {"listo": False, "inicio": time.time()}
+
+
+def precargar_datos():
+    """
+    Carga los datos antes de atender peticiones; con gunicorn se ejecuta en el proceso
+    principal y los workers heredan el almacen en memoria al crearse
+    """
+    if DataDB.MODO_DATOS == "memoria":
+        _estado_servidor["listo"] = refrescar_almacen() is not None
+    else:
+        obtener_version_carga()
+        _estado_servidor["listo"] = _version_carga["ok"]
+
+    if not _estado_servidor["listo"]:
+        print("Aviso: no se pudieron precargar los datos, /listo respondera 503 hasta que haya conexion")
+
+
+def reiniciar_despues_de_fork():
+    """
+    Cada worker abre sus propias conexiones: las del proceso principal no se comparten
+    """
+    global _cache_disco
+
+    if _engine is not None:
+        _engine.dispose(close=False)
+    _cache_disco = None
+
+
+@app.server.route("/salud")
+def salud():
+    """
+    Indica que el proceso esta vivo (no consulta MySQL)
+    """
+    estado = {"estado": "ok", "pid": os.getpid(),
+              "segundos_activo": round(time.time() - _estado_servidor["inicio"], 1)}
+    return Response(json.dumps(estado), mimetype="application/json")
+
+
+@app.server.route("/listo")
+def listo():
+    """
+    Indica si el proceso ya tiene datos para responder
+    En modo mysql se usa el resultado de la ultima consulta de version; si fallo se vuelve
+    a intentar, a lo mas una vez cada DataDB.VERSION_TTL segundos
+    """
+    if DataDB.MODO_DATOS == "memoria":
+        preparado = _almacen is not None
+        version = _almacen.version if preparado else None
+    else:
+        if not _version_carga["ok"]:
+            obtener_version_carga()
+        preparado = _version_carga["ok"]
+        _estado_servidor["listo"] = preparado
+        version = _version_carga["valor"]
+
+    estado = {
+        "listo": bool(preparado),
+        "modo": DataDB.MODO_DATOS,
+        "version": None if version is None else str(version),
+        "pool": str(estadisticas_pool()["pool"]),
+    }
+    return Response(json.dumps(estado), status=200 if preparado else 503, mimetype="application/json")
+
+
+def servir(workers=None, hilos=None, host=None, puerto=None):
+    """
+    Inicia el dashboard con gunicorn: varios workers con hilos, datos precargados
+    y cache en disco compartida (si diskcache esta instalado)
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("El modo serve requiere gunicorn: pip install gunicorn (no disponible en Windows)")
+        return
+
+    class ServidorDashboard(BaseApplication):
+
+        def __init__(self, opciones):
+            self.opciones = opciones
+            super().__init__()
+
+        def load_config(self):
+            for clave, valor in self.opciones.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            return app.server
+
+    if diskcache is not None and not DataDB.CACHE_DIRECTORIO:
+        DataDB.CACHE_DIRECTORIO = DataDB.CACHE_DIRECTORIO_SERVIDOR
+
+    print("Precargando datos...")
+    precargar_datos()
+
+    opciones = {
+        "bind": f"{host or DataDB.SERVIDOR_HOST}:{puerto or DataDB.SERVIDOR_PUERTO}",
+        "workers": workers or DataDB.SERVIDOR_WORKERS,
+        "threads": hilos or DataDB.SERVIDOR_HILOS,
+        "worker_class": "gthread",
+        "preload_app": True,
+        "post_fork": lambda servidor, worker: reiniciar_despues_de_fork(),
+    }
+    print(f"Iniciando dashboard en http://{opciones['bind']} "
+          f"({opciones['workers']} workers x {opciones['threads']} hilos)")
+    ServidorDashboard(opciones).run()
+
+
+def prueba_carga(url="http://localhost:8050", usuarios=20, peticiones=500, revalidar=False):
+    """
+    Prueba de carga: usuarios concurrentes pidiendo las figuras del dashboard
+    Con revalidar se envia la ETag recibida (como lo hace el navegador)
+    Reporta peticiones por segundo y latencia
+    """
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+
+    print(f"\n=== PRUEBA DE CARGA: {usuarios} usuarios, {peticiones} peticiones ===")
+
+    rutas = [f"/figuras/{consulta}" for _, consulta, _ in GRAFICAS]
+    etags = {}
+
+    def pedir(numero):
+        ruta = rutas[numero % len(rutas)]
+        encabezados = {"Accept-Encoding": "gzip"}
+        if revalidar and ruta in etags:
+            encabezados["If-None-Match"] = etags[ruta]
+
+        inicio = time.perf_counter()
+        try:
+            with urlopen(Request(url + ruta, headers=encabezados), timeout=60) as respuesta:
+                respuesta.read()
+                estado, etag = respuesta.status, respuesta.headers.get("ETag")
+        except HTTPError as e:
+            # urllib trata el 304 como error
+            estado, etag = e.code, e.headers.get("ETag")
+        except Exception:
+            estado, etag = None, None
+
+        if etag:
+            etags[ruta] = etag
+        return estado, time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=usuarios) as executor:
+        resultados = list(executor.map(pedir, range(peticiones)))
+    total = time.perf_counter() - inicio
+
+    latencias = np.array([duracion for _, duracion in resultados]) * 1000
+    estados = pd.Series([estado for estado, _ in resultados]).value_counts(dropna=False)
+    errores = sum(1 for estado, _ in resultados if estado not in (200, 304))
+
+    reporte = {
+        "peticiones_por_segundo": round(peticiones / total, 1),
+        "p50_ms": round(float(np.percentile(latencias, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencias, 95)), 1),
+        "p99_ms": round(float(np.percentile(latencias, 99)), 1),
+        "maximo_ms": round(float(latencias.max()), 1),
+        "errores": errores,
+    }
+
+    for clave, valor in reporte.items():
+        print(f"  {clave}: {valor}")
+    print("  Respuestas por estado HTTP:")
+    print(estados.to_string())
+
+    return reporte
+
+
 #quedo
 if __name__ == "__main__":
-    print("Iniciando dashboard...")
-    print("Abre tu navegador en: http://localhost:8050")
-    app.run(debug=True, port=8050)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Dashboard de seguridad publica en Mexico")
+    comandos = parser.add_subparsers(dest="comando")
+
+    serve = comandos.add_parser("serve", help="servidor de produccion con gunicorn")
+    serve.add_argument("--workers", type=int, default=DataDB.SERVIDOR_WORKERS)
+    serve.add_argument("--hilos", type=int, default=DataDB.SERVIDOR_HILOS)
+    serve.add_argument("--host", default=DataDB.SERVIDOR_HOST)
+    serve.add_argument("--puerto", type=int, default=DataDB.SERVIDOR_PUERTO)
+
+    carga = comandos.add_parser("prueba-carga", help="prueba de carga contra un dashboard en ejecucion")
+    carga.add_argument("--url", default="http://localhost:8050")
+    carga.add_argument("--usuarios", type=int, default=20)
+    carga.add_argument("--peticiones", type=int, default=500)
+    carga.add_argument("--revalidar", action="store_true")
+
+    argumentos = parser.parse_args()
+
+    if argumentos.comando == "serve":
+        servir(argumentos.workers, argumentos.hilos, argumentos.host, argumentos.puerto)
+    elif argumentos.comando == "prueba-carga":
+        prueba_carga(argumentos.url, argumentos.usuarios, argumentos.peticiones, argumentos.revalidar)
+    else:
+        print("Iniciando dashboard...")
+        print("Abre tu navegador en: http://localhost:8050")
+        precargar_datos()
+        app.run(debug=True, port=8050)
@@ -19,7 +19,8 @@ CREATE TABLE tipos_delito (
     modalidad VARCHAR(200),
     categoria VARCHAR(50),
     descripcion TEXT,
-    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uk_tipo_delito (nombre, subtipo, modalidad)
 );
 
 -- Tabla: incidencia_delictiva
@@ -38,11 +39,15 @@ CREATE TABLE incidencia_delictiva (
     fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (id_estado) REFERENCES estados(id_estado),
     FOREIGN KEY (id_tipo_delito) REFERENCES tipos_delito(id_tipo_delito),
+    UNIQUE KEY uk_incidencia_grano (anio, mes_num, id_estado, id_tipo_delito),
     INDEX idx_anio (anio),
     INDEX idx_mes (mes_num),
-    INDEX idx_estado (id_estado),
-    INDEX idx_tipo_delito (id_tipo_delito),
-    INDEX idx_fecha (fecha)
+    INDEX idx_fecha (fecha),
+    -- Indices que cubren las agregaciones de carga_bd (agrupan y suman cantidad sin leer la tabla)
+    INDEX idx_estado_anio_cantidad (id_estado, anio, cantidad),
+    INDEX idx_estado_mes_cantidad (id_estado, mes_num, cantidad),
+    INDEX idx_tipo_estado_cantidad (id_tipo_delito, id_estado, cantidad),
+    INDEX idx_tipo_mes_cantidad (id_tipo_delito, anio, mes_num, cantidad)
 );
 
 -- Tabla: percepcion_seguridad
@@ -54,10 +59,12 @@ CREATE TABLE percepcion_seguridad (
     total_delitos INT,
     fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (id_estado) REFERENCES estados(id_estado),
-    INDEX idx_anio_estado (anio, id_estado)
+    UNIQUE KEY uk_anio_estado (anio, id_estado)
 );
 
 -- Tabla: estadisticas_agregadas
+-- carga_bd la recalcula despues de cada carga (estado_anio, estado_mes, tipo_estado,
+-- tipo_total, tipo_mes) y el dashboard consulta estas filas en lugar de la tabla de hechos
 CREATE TABLE estadisticas_agregadas (
     id_estadistica INT AUTO_INCREMENT PRIMARY KEY,
     tipo_agregacion VARCHAR(50) NOT NULL,
@@ -70,10 +77,19 @@ CREATE TABLE estadisticas_agregadas (
     fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (id_estado) REFERENCES estados(id_estado),
     FOREIGN KEY (id_tipo_delito) REFERENCES tipos_delito(id_tipo_delito),
-    INDEX idx_tipo_agregacion (tipo_agregacion),
+    INDEX idx_agregacion_cubierta (tipo_agregacion, id_estado, anio, mes_num,
+                                   id_tipo_delito, total_delitos, promedio_delitos),
     INDEX idx_anio (anio)
 );
 
+-- Tabla: version_carga
+-- carga_bd registra una fila al terminar cada carga; el dashboard la usa para invalidar su cache
+CREATE TABLE version_carga (
+    id_version INT AUTO_INCREMENT PRIMARY KEY,
+    registros INT,
+    fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 
 -- VISTAS PARA ANALISIS
 
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+         'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+# Tipos compactos de la tabla de incidencia, compartidos por extraccion, transformacion y carga
+ESQUEMA_INCIDENCIA = {
+    "anio": "int16",
+    "mes": pd.CategoricalDtype(MESES, ordered=True),
+    "mes_num": "int8",
+    "estado": "category",
+    "tipo_delito": "category",
+    "subtipo_delito": "category",
+    "modalidad": "category",
+    "cantidad": "int32",
+    "categoria_delito": "category",
+}
+
+# Tipos para leer la incidencia extraida, antes de limpiar_datos: enteros que admiten nulos
+# y categorias sin lista fija, para que los registros con huecos o espacios lleguen a la limpieza
+# El esquema estricto (ESQUEMA_INCIDENCIA) se aplica al terminar de limpiar
+ESQUEMA_LECTURA = {
+    **ESQUEMA_INCIDENCIA,
+    "anio": "Int16",
+    "mes": "category",
+    "mes_num": "Int8",
+    "cantidad": "Int32",
+}
+
+# Columnas que se calculan a partir de anio y mes_num, no se guardan en memoria
+# y solo se agregan al escribir archivos o insertar en la base de datos
+COLUMNAS_DERIVADAS = ["fecha", "periodo"]
+
+
+def aplicar_esquema(df, esquema=None):
+    """
+    Convierte las columnas presentes a los tipos del esquema
+    y elimina las columnas derivadas
+    """
+    esquema = esquema or ESQUEMA_INCIDENCIA
+
+    df = df.drop(columns=[c for c in COLUMNAS_DERIVADAS if c in df.columns])
+    tipos = {columna: tipo for columna, tipo in esquema.items() if columna in df.columns}
+
+    return df.astype(tipos)
+
+
+def convertir_tipos(df, esquema=None):
+    """
+    Convierte en el mismo DataFrame las columnas cuyo tipo no es el del esquema
+    (a diferencia de aplicar_esquema no crea otra copia del DataFrame)
+    """
+    esquema = esquema or ESQUEMA_INCIDENCIA
+
+    for columna, tipo in esquema.items():
+        if columna in df.columns and df[columna].dtype != tipo:
+            df[columna] = df[columna].astype(tipo)
+
+    return df
+
+
+def tipos_lectura(columnas, esquema=None):
+    """
+    Retorna los tipos del esquema para las columnas de un archivo,
+    para pasarlos a read_csv y convertir al leer
+    """
+    esquema = esquema or ESQUEMA_INCIDENCIA
+    return {columna: esquema[columna] for columna in columnas if columna in esquema}
+
+
+def derivar_fecha_periodo(df):
+    """
+    Agrega fecha (AAAA-MM) y periodo (Mes AAAA) a partir de anio y mes_num
+    Se calcula una vez por combinacion distinta de año y mes
+    """
+    clave = df["anio"].astype("int32") * 100 + df["mes_num"].astype("int32")
+    codigos, unicos = pd.factorize(clave)
+
+    anios = np.asarray(unicos) // 100
+    meses = np.asarray(unicos) % 100
+    fechas = [f"{anio}-{mes:02d}" for anio, mes in zip(anios, meses)]
+    periodos = [f"{MESES[mes - 1]} {anio}" for anio, mes in zip(anios, meses)]
+
+    return df.assign(
+        fecha=pd.Categorical.from_codes(codigos, fechas),
+        periodo=pd.Categorical.from_codes(codigos, periodos)
+    )
+
+
+def quitar_espacios(serie):
+    """
+    Quita espacios al inicio y al final de una columna de texto
+    En columnas categoricas solo se revisan las categorias
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        categorias = serie.cat.categories
+        if categorias.equals(categorias.str.strip()):
+            return serie
+        return serie.astype(str).str.strip().astype("category")
+
+    return serie.str.strip()
+
+
+def reportar_memoria(df, etapa):
+    """
+    Imprime la memoria que ocupa el DataFrame en una etapa del proceso
+    """
+    memoria = df.memory_usage(deep=True).sum() / 1024 ** 2
+    print(f" Memoria ({etapa}): {memoria:.2f} MB en {len(df)} registros")
+    return memoria
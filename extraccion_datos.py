@@ -8,22 +8,72 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+from urllib.parse import urljoin
+import requests
 import pandas as pd
+import hashlib
+import json
 import zipfile
+from almacenamiento_datos import guardar_tabla, ruta_datos
+from esquema_datos import MESES, aplicar_esquema, reportar_memoria
 import os
+import sys
 import time
 
+
+# Filtros de la extraccion (se pueden ampliar a los 32 estados y 2015-2025)
+ESTADOS_INTERES = ['Baja California', 'Sinaloa', 'Chihuahua']
+ANIOS_INTERES = [2023, 2024]
+DELITOS_RELEVANTES = [
+    'Homicidio', 'Secuestro', 'Robo',
+    'Violencia familiar', 'Lesiones'
+]
+
+# Registros del CSV del SESNSP que se leen a la vez
+TAMANO_CHUNK = 200000
+
+# Paginas de origen de los datos
+URL_INEGI = "https://www.inegi.org.mx/temas/incidencia/"
+URL_SESNSP = "https://www.gob.mx/sesnsp/acciones-y-programas/datos-abiertos-de-incidencia-delictiva"
+
+# Textos con los que se busca el enlace del ZIP en la pagina del SESNSP, en orden
+TEXTOS_ENLACE_SESNSP = ["2015 -2025", "Fuero Común - Delitos"]
+
+# Chrome sin ventana; se usa solo si la descarga directa por HTTP falla
+MODO_HEADLESS = True
+TIMEOUT_PAGINA = 20
+TIMEOUT_DESCARGA = 230
+TAMANO_BLOQUE_DESCARGA = 1024 * 1024
+
+# Motor para parsear las tablas HTML: "lxml" (pd.read_html) o "bs4" (BeautifulSoup celda por celda)
+MOTOR_HTML = "lxml"
+# Indices de las tablas de la pagina del INEGI que se extraen
+TABLAS_INEGI = [0]
+
+# Cache de descargas en la carpeta descargas/ (ETag, Last-Modified y SHA-256 por URL)
+ARCHIVO_CACHE_DESCARGAS = "cache_descargas.json"
+
+
 #:(((
-def configurar_selenium():
+def configurar_selenium(headless=None, download_dir=None):
 
     print("\n=== CONFIGURANDO SELENIUM ===")
 
+    headless = MODO_HEADLESS if headless is None else headless
+
     chrome_options = Options()
-    chrome_options.add_argument("--start-maximized")
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1920,1080")
+    else:
+        chrome_options.add_argument("--start-maximized")
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
 
     # Configurar carpeta de descargas
-    download_dir = os.path.join(os.getcwd(), "descargas")
+    download_dir = download_dir or os.path.join(os.getcwd(), "descargas")
     os.makedirs(download_dir, exist_ok=True)
 
     prefs = {
@@ -37,96 +87,175 @@ def configurar_selenium():
     service = Service(ChromeDriverManager().install())
     driver = webdriver.Chrome(service=service, options=chrome_options)
 
-    print(" Selenium configurado correctamente")
+    # En modo headless Chrome bloquea las descargas si no se permiten explicitamente
+    if headless:
+        try:
+            driver.execute_cdp_cmd("Page.setDownloadBehavior",
+                                   {"behavior": "allow", "downloadPath": download_dir})
+        except Exception as e:
+            print(f" No se pudo habilitar la descarga en modo headless: {e}")
+
+    print(f" Selenium configurado correctamente (headless={headless})")
     return driver, download_dir
 
 
-def scraping_tabla_inegi(driver):
+def esperar_pagina(driver, timeout=None):
     """
-    Hace web scraping de la tabla HTML del INEGI
+    Espera a que el documento termine de cargar en lugar de dormir un tiempo fijo
     """
-    print("\n=== WEB SCRAPING: TABLA HTML DEL INEGI ===")
+    WebDriverWait(driver, timeout or TIMEOUT_PAGINA).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
 
-    try:
-        # Navegar a la pagina del INEGI
-        url_inegi = "https://www.inegi.org.mx/temas/incidencia/"
-        print(f"Navegando a: {url_inegi}")
-        driver.get(url_inegi)
 
-        #  para que la pagina cargue completamente
-        print("Esperando a que la página cargue")
-        time.sleep(10)
+def tabla_bs4_a_dataframe(tabla):
+    """
+    Convierte un elemento <table> de BeautifulSoup en DataFrame, celda por celda
+    """
+    # Extraer encabezados
+    encabezados = []
+    thead = tabla.find('thead')
+    if thead:
+        for th in thead.find_all('th'):
+            encabezados.append(th.text.strip())
+
+    # Si no hay thead, buscar en la primera fila
+    if not encabezados:
+        primera_fila = tabla.find('tr')
+        if primera_fila:
+            for th in primera_fila.find_all(['th', 'td']):
+                encabezados.append(th.text.strip())
 
-        # Intentar esperar a que la tabla esté presente
-        try:
-            wait = WebDriverWait(driver, 15)
-            wait.until(EC.presence_of_element_located((By.TAG_NAME, "table")))
-            print(" Tabla detectada en la pagina")
-        except:
-            print(" La tabla puede no estar cargada aun")
+    # Extraer filas de datos
+    filas = []
+    tbody = tabla.find('tbody')
+    if tbody:
+        for tr in tbody.find_all('tr'):
+            fila = []
+            for td in tr.find_all('td'):
+                fila.append(td.text.strip())
+            if fila:
+                filas.append(fila)
+    else:
+        # Si no hay tbody, buscar todas las filas exepto la primera
+        todas_filas = tabla.find_all('tr')[1:]
+        for tr in todas_filas:
+            fila = []
+            for td in tr.find_all('td'):
+                fila.append(td.text.strip())
+            if fila:
+                filas.append(fila)
+
+    return pd.DataFrame(filas, columns=encabezados if encabezados else None)
+
+
+def leer_tablas_html(html, tablas=None, motor=None):
+    """
+    Lee las tablas de un HTML como lista de DataFrames
+    tablas: indices de las tablas a regresar (None = todas)
+    motor: "lxml" parsea todas las tablas en una llamada con pd.read_html,
+           "bs4" recorre las celdas con BeautifulSoup (metodo original)
+    """
+    motor = motor or MOTOR_HTML
 
-        # Obtener el HTML de la página
-        html = driver.page_source
+    if motor == "lxml":
+        try:
+            resultado = pd.read_html(StringIO(html), flavor="lxml")
+        except ValueError:
+            # read_html lanza ValueError cuando no hay ninguna tabla
+            resultado = []
+    else:
         soup = BeautifulSoup(html, 'html.parser')
+        resultado = [tabla_bs4_a_dataframe(tabla) for tabla in soup.find_all('table')]
 
-        # Buscar la tabla
-        print("Extrayendo tabla HTML...")
-        tabla = soup.find('table')
+    if tablas is None:
+        return resultado
+    return [resultado[i] for i in tablas if -len(resultado) <= i < len(resultado)]
 
-        if not tabla:
-            print(" No se encontro la tabla en la pagina")
-            print("  (La tabla puede cargarse dinámicamente con JavaScript)")
-            return None
 
-        # Extraer encabezados
-        encabezados = []
-        thead = tabla.find('thead')
-        if thead:
-            for th in thead.find_all('th'):
-                encabezados.append(th.text.strip())
+def extraer_tabla_html(html, tablas=None, motor=None):
+    """
+    Extrae las tablas seleccionadas de un HTML como un solo DataFrame,
+    filtrado por los estados de interes
+    """
+    print(f"Extrayendo tabla HTML ({motor or MOTOR_HTML})...")
+    encontradas = leer_tablas_html(html, tablas if tablas is not None else TABLAS_INEGI, motor)
 
-        # Si no hay thead, buscar en la primera fila
-        if not encabezados:
-            primera_fila = tabla.find('tr')
-            if primera_fila:
-                for th in primera_fila.find_all(['th', 'td']):
-                    encabezados.append(th.text.strip())
-
-        print(f" Encabezados encontrados: {len(encabezados)}")
-
-        # Extraer filas de datos
-        filas = []
-        tbody = tabla.find('tbody')
-        if tbody:
-            for tr in tbody.find_all('tr'):
-                fila = []
-                for td in tr.find_all('td'):
-                    fila.append(td.text.strip())
-                if fila:
-                    filas.append(fila)
-        else:
-            # Si no hay tbody, buscar todas las filas exepto la primera
-            todas_filas = tabla.find_all('tr')[1:]
-            for tr in todas_filas:
-                fila = []
-                for td in tr.find_all('td'):
-                    fila.append(td.text.strip())
-                if fila:
-                    filas.append(fila)
+    if not encontradas:
+        print(" No se encontro la tabla en la pagina")
+        print("  (La tabla puede cargarse dinámicamente con JavaScript)")
+        return None
+
+    df = pd.concat(encontradas, ignore_index=True) if len(encontradas) > 1 else encontradas[0]
+
+    print(f" Tablas extraidas: {len(encontradas)}")
+    print(f" Encabezados encontrados: {len(df.columns)}")
+    print(f" Filas extraidas: {len(df)}")
+
+    # Filtrar por estados de interes
+    if 'Entidad' in df.columns:
+        df = df[df['Entidad'].isin(ESTADOS_INTERES)]
+
+    print(f" Datos del INEGI extraidos: {len(df)} registros")
+
+    return df
 
-        print(f" Filas extraidas: {len(filas)}")
 
-        # Crear DataFrame
-        df = pd.DataFrame(filas, columns=encabezados if encabezados else None)
+def comparar_motores_html(ruta_html, repeticiones=5, motores=("bs4", "lxml")):
+    """
+    Mide el tiempo de leer todas las tablas de un HTML guardado con cada motor
+    """
+    print("\n=== COMPARANDO MOTORES DE PARSEO HTML ===")
+
+    with open(ruta_html, encoding='utf-8') as archivo:
+        html = archivo.read()
+
+    resultados = []
+
+    for motor in motores:
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            tablas = leer_tablas_html(html, motor=motor)
+            tiempos.append(time.perf_counter() - inicio)
+
+        resultados.append({
+            "motor": motor,
+            "tablas": len(tablas),
+            "filas": sum(len(tabla) for tabla in tablas),
+            "mediana_ms": round(sorted(tiempos)[len(tiempos) // 2] * 1000, 1),
+            "minimo_ms": round(min(tiempos) * 1000, 1),
+        })
+
+    df_resultados = pd.DataFrame(resultados)
+    print(f"Archivo: {ruta_html} ({len(html) / 1024 ** 2:.1f} MB)")
+    print(df_resultados.to_string(index=False))
 
-        # Filtrar por estados de interes
-        estados_interes = ['Baja California', 'Sinaloa', 'Chihuahua']
-        if 'Entidad' in df.columns:
-            df = df[df['Entidad'].isin(estados_interes)]
+    return df_resultados
 
-        print(f" Datos del INEGI extraidos: {len(df)} registros")
 
-        return df
+def scraping_tabla_inegi(driver, url=None):
+    """
+    Hace web scraping de la tabla HTML del INEGI
+    """
+    print("\n=== WEB SCRAPING: TABLA HTML DEL INEGI ===")
+
+    try:
+        # Navegar a la pagina del INEGI
+        url_inegi = url or URL_INEGI
+        print(f"Navegando a: {url_inegi}")
+        driver.get(url_inegi)
+
+        # Esperar a que la pagina cargue y la tabla este presente
+        print("Esperando a que la página cargue")
+        try:
+            esperar_pagina(driver)
+            WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
+            print(" Tabla detectada en la pagina")
+        except:
+            print(" La tabla puede no estar cargada aun")
+
+        return extraer_tabla_html(driver.page_source)
 
     except Exception as e:
         print(f" Error en scraping del INEGI: {e}")
@@ -134,7 +263,7 @@ def scraping_tabla_inegi(driver):
         return None
 
 
-def descargar_archivo_sesnsp(driver, download_dir):
+def descargar_archivo_sesnsp(driver, download_dir, url=None):
     """
     Descarga el archivo del SESNSP usando Selenium
     """
@@ -142,74 +271,73 @@ def descargar_archivo_sesnsp(driver, download_dir):
 
     try:
         # Navegar a la pagina del SESNSP
-        url_sesnsp = "https://www.gob.mx/sesnsp/acciones-y-programas/datos-abiertos-de-incidencia-delictiva"
+        url_sesnsp = url or URL_SESNSP
         print(f"Navegando a: {url_sesnsp}")
         driver.get(url_sesnsp)
-        time.sleep(5)
+        esperar_pagina(driver)
 
         # Buscar el enlace de descarga con texto parcial
         print("Buscando enlace de descarga...")
-        wait = WebDriverWait(driver, 20)
+        wait = WebDriverWait(driver, TIMEOUT_PAGINA)
 
-        try:
-            # Intentar buscar por texto parcial
-            enlace_descarga = wait.until(EC.element_to_be_clickable((
-                By.PARTIAL_LINK_TEXT, "2015 -2025"
-            )))
-            print(f" Enlace encontrado por texto parcial")
-        except:
+        enlace_descarga = None
+        for texto in TEXTOS_ENLACE_SESNSP:
             try:
-                # Alternativa: buscar por otro texto parcial
-                enlace_descarga = wait.until(EC.element_to_be_clickable((
-                    By.PARTIAL_LINK_TEXT, "Fuero Común - Delitos"
-                )))
-                print(f" Enlace encontrado por texto alternativo")
+                enlace_descarga = wait.until(EC.element_to_be_clickable((By.PARTIAL_LINK_TEXT, texto)))
+                print(f" Enlace encontrado por texto parcial: {texto}")
+                break
             except:
-                print("No se encontro el enlace de descarga")
-                return None
+                continue
+
+        if enlace_descarga is None:
+            print("No se encontro el enlace de descarga")
+            return None
 
         # Obtener el texto del enlace para confirmar
         texto_enlace = enlace_descarga.text
         print(f"  Texto del enlace: {texto_enlace[:80]}...")
 
-        # Hacer clic en el enlace
+        # ZIPs que ya estaban en la carpeta (por ejemplo el de la descarga HTTP anterior)
+        # para no confundirlos con la descarga nueva
+        previos = archivos_zip(download_dir)
+
+        # Hacer clic en el enlace y esperar la nueva ventana (OneDrive)
         print("Haciendo clic en el enlace...")
+        ventanas = len(driver.window_handles)
         enlace_descarga.click()
-        time.sleep(8)
 
-        # Cambiar a la nueva ventana (OneDrive)
-        if len(driver.window_handles) > 1:
-            driver.switch_to.window(driver.window_handles[-1])
-            print(" Cambiado a ventana de OneDrive")
-            time.sleep(5)
+        try:
+            wait.until(EC.number_of_windows_to_be(ventanas + 1))
+        except:
+            print(" no se abrio ventana de OneDrive")
+            return None
 
-            # buscar y hacer clic en el botn de descarga
-            try:
-                print("Buscando botón de descarga...")
-                boton_descarga = wait.until(EC.element_to_be_clickable((By.ID, "downloadCommand")))
-                print(" Botón de descarga encontrado")
-                boton_descarga.click()
-                print(" Descarga iniciada")
-
-                # Esperar a que se complete la descarga
-                print("Esperando a que se complete la descarga...")
-                archivo_zip = esperar_descarga(download_dir, timeout=230)
-
-                if archivo_zip:
-                    print(f" Archivo descargado: {archivo_zip}")
-                    return archivo_zip
-                else:
-                    print("✗ Timeout: La descarga tardó demasiado")
-                    return None
-
-            except Exception as e:
-                print(f" Error al hacer clic en botón de descarga: {e}")
+        driver.switch_to.window(driver.window_handles[-1])
+        print(" Cambiado a ventana de OneDrive")
+        esperar_pagina(driver)
 
-                return None
-        else:
-            print(" no se abrio ventana de OneDrive")
+        # buscar y hacer clic en el botn de descarga
+        try:
+            print("Buscando botón de descarga...")
+            boton_descarga = wait.until(EC.element_to_be_clickable((By.ID, "downloadCommand")))
+            print(" Botón de descarga encontrado")
+            boton_descarga.click()
+            print(" Descarga iniciada")
+        except Exception as e:
+            print(f" Error al hacer clic en botón de descarga: {e}")
             return None
 
+        # Esperar a que se complete la descarga
+        print("Esperando a que se complete la descarga...")
+        archivo_zip = esperar_descarga(download_dir, previos, timeout=TIMEOUT_DESCARGA)
+
+        if archivo_zip:
+            print(f" Archivo descargado: {archivo_zip}")
+            return archivo_zip
+
+        print("✗ Timeout: La descarga tardó demasiado")
+        return None
+
     except Exception as e:
         print(f" Error en descarga del SESNSP: {e}")
         import traceback
@@ -217,108 +345,521 @@ def descargar_archivo_sesnsp(driver, download_dir):
         return None
 
 
-def esperar_descarga(download_dir, timeout=230):
+def archivos_zip(download_dir):
+    """
+    ZIPs de la carpeta con su fecha de modificacion y tamaño
+    """
+    archivos = {}
+    for archivo in os.listdir(download_dir):
+        if archivo.endswith('.zip'):
+            estado = os.stat(os.path.join(download_dir, archivo))
+            archivos[archivo] = (estado.st_mtime_ns, estado.st_size)
+    return archivos
+
+
+def esperar_descarga(download_dir, previos=None, timeout=None, intervalo=0.5):
     """
     Espera a que se complete la descarga
+    Chrome escribe en un archivo .crdownload y lo renombra al terminar,
+    asi que basta con revisar la carpeta en intervalos cortos hasta que aparezca el ZIP
+    Solo se acepta un ZIP que no estaba en previos o que cambio desde entonces
     """
-    tiempo_espera = 0
+    previos = previos or {}
+    timeout = timeout or TIMEOUT_DESCARGA
+    limite = time.monotonic() + timeout
+    siguiente_aviso = time.monotonic() + 10
+
+    while time.monotonic() < limite:
+        # Buscar archivos ZIP completos (los temporales terminan en .crdownload o .tmp)
+        archivos = [archivo for archivo, estado in archivos_zip(download_dir).items()
+                    if previos.get(archivo) != estado]
+
+        for archivo in archivos:
+            archivo_zip = os.path.join(download_dir, archivo)
+            if zipfile.is_zipfile(archivo_zip):
+                return archivo_zip
 
-    while tiempo_espera < timeout:
-        # Buscar archivos ZIP
-        archivos = [f for f in os.listdir(download_dir) if f.endswith('.zip')]
+        time.sleep(intervalo)
 
-        # Verificar que no sean archivos temporales
-        archivos_completos = [f for f in archivos if not f.endswith('.crdownload') and not f.endswith('.tmp')]
+        if time.monotonic() >= siguiente_aviso:
+            print(f"  Esperando descarga ({int(timeout - (limite - time.monotonic()))}s)")
+            siguiente_aviso += 10
 
-        if archivos_completos:
-            archivo_zip = os.path.join(download_dir, archivos_completos[0])
-            # Verificar que el archivo tenga tamaño > 0
-            if os.path.getsize(archivo_zip) > 1000000:  # Más de 1 MB
-                return archivo_zip
+    return None
+
+
+def enlace_descarga_directa(url):
+    """
+    Convierte un enlace compartido de OneDrive/SharePoint en uno de descarga directa
+    """
+    if ("sharepoint.com" in url or "1drv.ms" in url or "onedrive" in url) and "download=1" not in url:
+        return url + ("&" if "?" in url else "?") + "download=1"
+    return url
+
+
+def buscar_enlace_sesnsp(url=None, sesion=None):
+    """
+    Busca por HTTP el enlace del ZIP en la pagina del SESNSP, sin abrir el navegador
+    """
+    url = url or URL_SESNSP
+    sesion = sesion or requests.Session()
 
-        time.sleep(2)
-        tiempo_espera += 2
+    respuesta = sesion.get(url, timeout=TIMEOUT_PAGINA)
+    respuesta.raise_for_status()
+    soup = BeautifulSoup(respuesta.text, 'html.parser')
 
-        if tiempo_espera % 10 == 0:
-            print(f"  Esperando descarga ({tiempo_espera}s)")
+    for texto in TEXTOS_ENLACE_SESNSP:
+        for enlace in soup.find_all('a', href=True):
+            if texto in enlace.get_text():
+                return enlace_descarga_directa(urljoin(url, enlace['href']))
 
     return None
 
 
-def extraer_csv_de_zip(archivo_zip, download_dir):
+def leer_cache_descargas(download_dir):
     """
-    Extrae el archivo CSV del ZIP descargado
+    Lee el cache de descargas de la carpeta: por URL guarda ETag, Last-Modified
+    y SHA-256 del archivo; ademas la huella del ultimo ZIP que se proceso
     """
-    print("\n=== EXTRAYENDO ARCHIVO CSV ===")
+    ruta = os.path.join(download_dir, ARCHIVO_CACHE_DESCARGAS)
+    if not os.path.exists(ruta):
+        return {"urls": {}, "procesado": None}
+
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def guardar_cache_descargas(download_dir, cache):
+    ruta = os.path.join(download_dir, ARCHIVO_CACHE_DESCARGAS)
+    with open(ruta, "w", encoding='utf-8') as archivo:
+        json.dump(cache, archivo, indent=2, ensure_ascii=False)
+
+
+def calcular_sha256(ruta):
+    """
+    SHA-256 de un archivo, leido en bloques
+    """
+    huella = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE_DESCARGA), b""):
+            huella.update(bloque)
+    return huella.hexdigest()
+
+
+def huella_registrada(entrada, ruta):
+    """
+    SHA-256 guardado en la entrada del cache si el archivo sigue igual al que se registro
+    (mismo tamaño y fecha de modificacion), sin volver a leerlo; None si cambio
+    """
+    if not entrada or not os.path.exists(ruta):
+        return None
+
+    estado = os.stat(ruta)
+    if entrada.get("tamano") == estado.st_size and entrada.get("mtime_ns") == estado.st_mtime_ns:
+        return entrada.get("sha256")
+    return None
+
+
+def encabezados_condicionales(entrada, destino):
+    """
+    Encabezados If-None-Match / If-Modified-Since a partir de la entrada del cache
+    Solo se envian si el archivo local sigue igual al que se descargo
+    """
+    if huella_registrada(entrada, destino) is None:
+        return {}
+
+    encabezados = {}
+    if entrada.get("etag"):
+        encabezados["If-None-Match"] = entrada["etag"]
+    if entrada.get("last_modified"):
+        encabezados["If-Modified-Since"] = entrada["last_modified"]
+    return encabezados
+
+
+def validador_respuesta(respuesta):
+    """
+    Validador para If-Range: ETag fuerte o, si no hay, Last-Modified
+    (If-Range no admite ETag debiles W/...)
+    """
+    etag = respuesta.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return respuesta.headers.get("Last-Modified")
+
+
+def rango_respuesta(respuesta):
+    """
+    Lee Content-Range ("bytes inicio-fin/total" o "bytes */total")
+    Retorna (inicio, total); None en lo que no venga
+    """
+    rango = respuesta.headers.get("Content-Range", "")
+    if not rango.startswith("bytes "):
+        return None, None
+
+    posiciones, _, total = rango[6:].partition("/")
+    inicio = posiciones.split("-")[0]
+    return (int(inicio) if inicio.isdigit() else None,
+            int(total) if total.isdigit() else None)
+
+
+def descartar_parcial(parcial):
+    for ruta in (parcial, parcial + ".validador"):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def descargar_http(url, destino, sesion=None, condicional=None, reintento=False):
+    """
+    Descarga un archivo por HTTP en bloques, sin cargarlo completo en memoria
+    Si quedo una descarga parcial (.part) se continua con Range e If-Range: si el archivo
+    cambio en el servidor este responde 200 con el archivo completo y el .part se reemplaza
+    Antes de renombrar el .part se compara su tamaño con Content-Range / Content-Length
+    Con encabezados condicionales el servidor puede responder 304 y no se descarga nada
+    Retorna la respuesta (status_code y headers)
+    """
+    sesion = sesion or requests.Session()
+    parcial = destino + ".part"
+    ruta_validador = parcial + ".validador"
+
+    # Sin el validador de la descarga original no se puede saber si el .part sigue vigente
+    validador = None
+    if os.path.exists(ruta_validador):
+        with open(ruta_validador, encoding='utf-8') as archivo:
+            validador = archivo.read().strip() or None
+    if os.path.exists(parcial) and not validador:
+        descartar_parcial(parcial)
+
+    descargado = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    if descargado:
+        encabezados = {"Range": f"bytes={descargado}-", "If-Range": validador}
+    else:
+        encabezados = dict(condicional or {})
+
+    reiniciar = False
+
+    with sesion.get(url, headers=encabezados, stream=True, timeout=TIMEOUT_PAGINA) as respuesta:
+        if respuesta.status_code == 304:
+            return respuesta
+
+        if respuesta.status_code == 416 and descargado:
+            # El rango pedido empieza al final: solo es valido si el .part ya tiene el tamaño total
+            _, total = rango_respuesta(respuesta)
+            reiniciar = total != descargado
+        else:
+            respuesta.raise_for_status()
+
+            if respuesta.status_code == 206:
+                inicio, total = rango_respuesta(respuesta)
+                reiniciar = inicio != descargado
+                modo = "ab"
+                if not reiniciar:
+                    print(f"  Reanudando descarga desde {descargado / 1024 ** 2:.1f} MB")
+            else:
+                # 200: el servidor no admite Range o el archivo cambio (If-Range no coincidio)
+                if descargado:
+                    print("  El archivo cambio en el servidor o no admite reanudar, se descarga completo")
+                modo = "wb"
+                longitud = respuesta.headers.get("Content-Length")
+                comprimido = respuesta.headers.get("Content-Encoding") not in (None, "identity")
+                total = int(longitud) if longitud and longitud.isdigit() and not comprimido else None
+
+                validador = validador_respuesta(respuesta)
+                descartar_parcial(parcial)
+                if validador:
+                    with open(ruta_validador, "w", encoding='utf-8') as archivo:
+                        archivo.write(validador)
+
+            if not reiniciar:
+                with open(parcial, modo) as archivo:
+                    for bloque in respuesta.iter_content(chunk_size=TAMANO_BLOQUE_DESCARGA):
+                        archivo.write(bloque)
+
+    if reiniciar:
+        descartar_parcial(parcial)
+        if reintento:
+            raise IOError("El servidor respondio un rango distinto al pedido")
+        print("  La descarga parcial no coincide con el servidor, se descarga desde el inicio")
+        return descargar_http(url, destino, sesion, condicional, reintento=True)
+
+    tamano = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    if total is not None and tamano != total:
+        # Si falta una parte el .part se conserva para reanudar; si sobra esta corrupto
+        if tamano > total:
+            descartar_parcial(parcial)
+        raise IOError(f"Descarga incompleta: {tamano} de {total} bytes")
+
+    os.replace(parcial, destino)
+    descartar_parcial(parcial)
+    return respuesta
+
+
+def descargar_sesnsp_http(download_dir, url=None):
+    """
+    Descarga el ZIP del SESNSP directamente por HTTP
+    Usa el cache de descargas para pedir el archivo de forma condicional
+    Retorna None si no se encuentra el enlace o el archivo no es un ZIP
+    """
+    print("\n=== DESCARGA DIRECTA (HTTP) DEL SESNSP ===")
 
     try:
-        with zipfile.ZipFile(archivo_zip, 'r') as zip_ref:
-            archivos = zip_ref.namelist()
-            print(f"Archivos en el ZIP: {archivos}")
+        cache = leer_cache_descargas(download_dir)
 
-            # Buscar el archivo CSV
-            archivo_csv = [f for f in archivos if f.endswith('.csv')][0]
+        with requests.Session() as sesion:
+            enlace = buscar_enlace_sesnsp(url, sesion)
+            if not enlace:
+                print(" No se encontro el enlace de descarga en la pagina")
+                return None
+
+            destino = os.path.join(download_dir, "sesnsp_incidencia.zip")
+            entrada = cache["urls"].get(enlace)
+            condicional = encabezados_condicionales(entrada, destino)
 
-            print(f"Extrayendo: {archivo_csv}")
-            zip_ref.extract(archivo_csv, download_dir)
+            print(f"  Descargando: {enlace[:80]}...")
+            respuesta = descargar_http(enlace, destino, sesion, condicional)
 
-            ruta_csv = os.path.join(download_dir, archivo_csv)
-            print(f" CSV extraido: {ruta_csv}")
+        if respuesta.status_code == 304:
+            print(f" Cache: sin cambios en el servidor (304), se usa {destino}")
+            return destino
+
+        if not zipfile.is_zipfile(destino):
+            print(" El archivo descargado no es un ZIP (posible pagina de OneDrive)")
+            os.remove(destino)
+            return None
+
+        # Unica lectura completa del ZIP: el hash queda en el cache con el tamaño y la fecha
+        sha256 = calcular_sha256(destino)
+        estado = os.stat(destino)
+        if entrada and entrada.get("sha256") == sha256:
+            print(f" Cache: descargado de nuevo pero con el mismo contenido (sha256 {sha256[:12]})")
+        else:
+            print(f" Cache: archivo nuevo (sha256 {sha256[:12]})")
+
+        cache["urls"][enlace] = {
+            "etag": respuesta.headers.get("ETag"),
+            "last_modified": respuesta.headers.get("Last-Modified"),
+            "sha256": sha256,
+            "tamano": estado.st_size,
+            "mtime_ns": estado.st_mtime_ns,
+            "archivo": destino,
+        }
+        guardar_cache_descargas(download_dir, cache)
 
-            return ruta_csv
+        print(f" Archivo descargado: {destino}")
+        return destino
 
     except Exception as e:
-        print(f" Error al extraer CSV: {e}")
+        print(f" Error en descarga directa del SESNSP: {e}")
         return None
 
 
-def procesar_datos_sesnsp(ruta_csv):
+def firma_procesamiento(archivo_zip):
     """
-    Procesa el CSV del SESNSP
+    Identifica una extraccion: contenido del ZIP y filtros usados
+    El hash se toma del cache de descargas si el ZIP no cambio; solo se calcula
+    para un archivo que no paso por la descarga HTTP (por ejemplo el de Selenium)
     """
-    print("\n=== PROCESANDO DATOS DEL SESNSP ===")
+    cache = leer_cache_descargas(os.path.dirname(archivo_zip))
+    sha256 = None
+    for entrada in cache["urls"].values():
+        if entrada.get("archivo") and os.path.abspath(entrada["archivo"]) == os.path.abspath(archivo_zip):
+            sha256 = huella_registrada(entrada, archivo_zip)
+            if sha256:
+                break
+
+    return {
+        "sha256": sha256 or calcular_sha256(archivo_zip),
+        "estados": ESTADOS_INTERES,
+        "anios": ANIOS_INTERES,
+    }
+
+
+def zip_ya_procesado(archivo_zip, firma):
+    """
+    Indica si el ZIP ya se proceso con los mismos filtros y los archivos de salida siguen en dataset/
+    """
+    cache = leer_cache_descargas(os.path.dirname(archivo_zip))
+    salidas = [ruta_datos("incidencia_delictiva"), ruta_datos("percepcion_seguridad")]
+
+    return cache.get("procesado") == firma and all(os.path.exists(ruta) for ruta in salidas)
+
+
+def registrar_zip_procesado(archivo_zip, firma):
+    download_dir = os.path.dirname(archivo_zip)
+    cache = leer_cache_descargas(download_dir)
+    cache["procesado"] = firma
+    guardar_cache_descargas(download_dir, cache)
+
+
+def obtener_datos_inegi(url=None, headless=None):
+    """
+    Obtiene la tabla del INEGI: primero por HTTP y, si la tabla se carga
+    con JavaScript, con su propio navegador Selenium
+    """
+    url = url or URL_INEGI
+
+    try:
+        respuesta = requests.get(url, timeout=TIMEOUT_PAGINA)
+        respuesta.raise_for_status()
+        df = extraer_tabla_html(respuesta.text)
+        if df is not None and len(df) > 0:
+            return df
+    except Exception as e:
+        print(f" Error al leer el INEGI por HTTP: {e}")
+
+    driver, _ = configurar_selenium(headless)
+    try:
+        return scraping_tabla_inegi(driver, url)
+    finally:
+        driver.quit()
+
+
+def obtener_zip_sesnsp(download_dir=None, url=None, headless=None):
+    """
+    Obtiene el ZIP del SESNSP: primero por HTTP y, si falla, con su propio navegador Selenium
+    """
+    download_dir = download_dir or os.path.join(os.getcwd(), "descargas")
+    os.makedirs(download_dir, exist_ok=True)
+
+    archivo_zip = descargar_sesnsp_http(download_dir, url)
+    if archivo_zip:
+        return archivo_zip
 
+    driver, download_dir = configurar_selenium(headless, download_dir)
     try:
-        # Leer CSV
-        print("Leyendo archivo CSV...")
-        df = pd.read_csv(ruta_csv, encoding='latin-1', low_memory=False)
+        return descargar_archivo_sesnsp(driver, download_dir, url)
+    finally:
+        driver.quit()
 
-        print(f" Datos cargados: {len(df)} registros")
 
-        # Filtrar por estados
-        estados_interes = ['Baja California', 'Sinaloa', 'Chihuahua']
-        df = df[df['Entidad'].isin(estados_interes)]
-        print(f" Filtrado por estados: {len(df)} registros")
+def extraer_fuentes_concurrente(download_dir=None, url_inegi=None, url_sesnsp=None, headless=None):
+    """
+    Ejecuta al mismo tiempo el scraping del INEGI y la descarga del SESNSP
+    Cada fuente usa su propia sesion HTTP o navegador, por lo que no comparten estado
+    Retorna (df_inegi, archivo_zip)
+    """
+    inicio = time.perf_counter()
 
-        # Filtrar por años
-        df = df[df['Año'].isin([2023, 2024])]
-        print(f" Filtrado por años 2023-2024: {len(df)} registros")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futuro_inegi = executor.submit(obtener_datos_inegi, url_inegi, headless)
+        futuro_sesnsp = executor.submit(obtener_zip_sesnsp, download_dir, url_sesnsp, headless)
 
-        # Filtrar por delitos relevantes
-        delitos_relevantes = [
-            'Homicidio', 'Secuestro', 'Robo',
-            'Violencia familiar', 'Lesiones'
-        ]
+        try:
+            df_inegi = futuro_inegi.result()
+        except Exception as e:
+            print(f" Error en scraping del INEGI: {e}")
+            df_inegi = None
 
-        df = df[df['Tipo de delito'].str.contains('|'.join(delitos_relevantes), case=False, na=False)]
-        print(f" Filtrado por delitos relevantes: {len(df)} registros")
+        archivo_zip = futuro_sesnsp.result()
 
-        # Transformar de formato wide a long
-        print("Transformando formato de datos (wide → long)...")
+    print(f"\n Fuentes obtenidas en {time.perf_counter() - inicio:.1f}s")
+    return df_inegi, archivo_zip
+
+
+@contextmanager
+def abrir_origen_sesnsp(ruta):
+    """
+    Abre el origen de datos del SESNSP: un CSV o el ZIP descargado
+    Del ZIP se lee el CSV directamente con ZipFile.open, sin extraerlo a disco
+    """
+    if not str(ruta).lower().endswith('.zip'):
+        yield ruta
+        return
+
+    with zipfile.ZipFile(ruta, 'r') as zip_ref:
+        archivos = zip_ref.namelist()
+        print(f"Archivos en el ZIP: {archivos}")
+
+        # Buscar el archivo CSV
+        archivo_csv = [f for f in archivos if f.lower().endswith('.csv')][0]
+        print(f"Leyendo {archivo_csv} directamente del ZIP")
+
+        with zip_ref.open(archivo_csv) as archivo:
+            yield archivo
+
+
+def filtrar_y_transformar_chunk(chunk, estados, anios):
+    """
+    Aplica los filtros de estado, año y delito a un bloque del CSV
+    y lo transforma de formato wide a long
+    """
+    chunk = chunk[chunk['Entidad'].isin(estados) & chunk['Año'].isin(anios)]
+    chunk = chunk[chunk['Tipo de delito'].str.contains('|'.join(DELITOS_RELEVANTES),
+                                                       case=False, na=False)]
+
+    if chunk.empty:
+        return None
 
-        meses = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-                 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+    columnas_id = ['Año', 'Entidad', 'Tipo de delito', 'Subtipo de delito', 'Modalidad']
+    meses_disponibles = [m for m in MESES if m in chunk.columns]
 
-        columnas_id = ['Año', 'Entidad', 'Tipo de delito', 'Subtipo de delito', 'Modalidad']
-        meses_disponibles = [m for m in meses if m in df.columns]
+    df_long = pd.melt(
+        chunk,
+        id_vars=columnas_id,
+        value_vars=meses_disponibles,
+        var_name='mes',
+        value_name='cantidad'
+    )
 
-        df_long = pd.melt(
-            df,
-            id_vars=columnas_id,
-            value_vars=meses_disponibles,
-            var_name='mes',
-            value_name='cantidad'
-        )
+    # Eliminar meses sin dato o con cantidad 0
+    df_long = df_long[df_long['cantidad'].fillna(0) > 0]
+
+    return df_long
+
+
+def procesar_datos_sesnsp(ruta_csv, estados=None, anios=None, tamano_chunk=None):
+    """
+    Procesa el CSV del SESNSP leyendolo por bloques (chunks)
+    Solo se leen las columnas necesarias con tipos compactos y se filtra cada bloque,
+    asi la memoria no depende del tamaño del archivo nacional
+    ruta_csv puede ser el CSV o el ZIP descargado (se lee sin extraerlo)
+    """
+    print("\n=== PROCESANDO DATOS DEL SESNSP ===")
+
+    estados = estados or ESTADOS_INTERES
+    anios = anios or ANIOS_INTERES
+    tamano_chunk = tamano_chunk or TAMANO_CHUNK
+
+    columnas_id = ['Año', 'Entidad', 'Tipo de delito', 'Subtipo de delito', 'Modalidad']
+    tipos = {
+        'Año': 'int32',
+        'Entidad': 'category',
+        'Tipo de delito': 'category',
+        'Subtipo de delito': 'category',
+        'Modalidad': 'category',
+    }
+    tipos.update({mes: 'Int32' for mes in MESES})
+
+    try:
+        # Leer CSV por bloques
+        print(f"Leyendo archivo CSV en bloques de {tamano_chunk} registros...")
+        partes = []
+        registros_leidos = 0
+
+        with abrir_origen_sesnsp(ruta_csv) as origen:
+            # El CSV del SESNSP viene en latin-1, read_csv decodifica el flujo del ZIP
+            lector = pd.read_csv(
+                origen,
+                encoding='latin-1',
+                usecols=lambda columna: columna in columnas_id or columna in MESES,
+                dtype=tipos,
+                chunksize=tamano_chunk
+            )
+
+            for numero, chunk in enumerate(lector, start=1):
+                registros_leidos += len(chunk)
+                parte = filtrar_y_transformar_chunk(chunk, estados, anios)
+                if parte is not None:
+                    partes.append(parte)
+                print(f"  Bloque {numero}: {registros_leidos} registros leidos")
+
+        print(f" Datos cargados: {registros_leidos} registros")
+        print(f" Filtrado por estados {estados} y años {anios}")
+
+        if not partes:
+            return pd.DataFrame()
+
+        # Transformar de formato wide a long
+        df_long = pd.concat(partes, ignore_index=True)
 
         # Renombrar columnas
         df_long = df_long.rename(columns={
@@ -329,25 +870,16 @@ def procesar_datos_sesnsp(ruta_csv):
             'Modalidad': 'modalidad'
         })
 
-        # Agregar columna mes_num
-        meses_dict = {
-            'Enero': 1, 'Febrero': 2, 'Marzo': 3, 'Abril': 4,
-            'Mayo': 5, 'Junio': 6, 'Julio': 7, 'Agosto': 8,
-            'Septiembre': 9, 'Octubre': 10, 'Noviembre': 11, 'Diciembre': 12
-        }
-        df_long['mes_num'] = df_long['mes'].map(meses_dict)
-
-        # Agregar columnas adicionales
-        df_long['fecha'] = df_long['anio'].astype(str) + '-' + df_long['mes_num'].astype(str).str.zfill(2)
-        df_long['periodo'] = df_long['mes'] + ' ' + df_long['anio'].astype(str)
-
-        # Convertir cantida a numerico
-        df_long['cantidad'] = pd.to_numeric(df_long['cantidad'], errors='coerce').fillna(0).astype(int)
+        # Agregar columna mes_num a partir del orden de los meses
+        df_long['mes'] = pd.Categorical(df_long['mes'], categories=MESES, ordered=True)
+        df_long['mes_num'] = df_long['mes'].cat.codes + 1
 
-        # Eliminar registros con cantidad 0
-        df_long = df_long[df_long['cantidad'] > 0]
+        # Tipos compactos del esquema compartido (las categorias de cada bloque se unifican)
+        # fecha y periodo no se guardan en memoria, se derivan al escribir
+        df_long = aplicar_esquema(df_long)
 
         print(f" Datos finales del SESNSP: {len(df_long)} registros")
+        reportar_memoria(df_long, "extraccion")
 
         return df_long
 
@@ -364,7 +896,7 @@ def generar_datos_percepcion(df_delitos):
     """
     print("\n=== GENERANDO DATOS DE PERCEPCION ===")
 
-    percepcion = df_delitos.groupby(['anio', 'estado'])['cantidad'].sum().reset_index()
+    percepcion = df_delitos.groupby(['anio', 'estado'], observed=True)['cantidad'].sum().reset_index()
     percepcion.columns = ['anio', 'estado', 'total_delitos']
 
     max_delitos = percepcion['total_delitos'].max()
@@ -381,16 +913,9 @@ def generar_datos_percepcion(df_delitos):
 
 def guardar_datos(df, nombre_archivo):
     """
-    Guarda los datos en un archivo CSV
+    Guarda los datos en dataset/ con el formato configurado (CSV o Parquet)
     """
-    dataset_dir = "dataset"
-    os.makedirs(dataset_dir, exist_ok=True)
-
-    ruta = os.path.join(dataset_dir, nombre_archivo)
-    df.to_csv(ruta, index=False, encoding='utf-8')
-
-    print(f" Guardado: {ruta}")
-    return ruta
+    return guardar_tabla(df, nombre_archivo)
 
 
 def main():
@@ -402,85 +927,79 @@ def main():
 
     print("=" * 60)
 
-    # Configurar Selenium
-    driver, download_dir = configurar_selenium()
-
-    try:
-        # Web Scraping de tabla HTML del INEGI (opcional/complementario)
-        print("\n" + "=" * 60)
-        print("FUENTE 1: INEGI (Scraping de tabla HTML)")
-        print("=" * 60)
-        df_inegi = scraping_tabla_inegi(driver)
-
-        #Descarga de archivo del SESNSP con Selenium
-        print("\n" + "=" * 60)
-        print("FUENTE 2: SESNSP (Descarga con navegador)")
-        print("=" * 60)
-        archivo_zip = descargar_archivo_sesnsp(driver, download_dir)
-
-        if not archivo_zip:
-
+    # INEGI y SESNSP se obtienen al mismo tiempo, cada uno por HTTP y con Selenium headless como respaldo
+    print("\n" + "=" * 60)
+    print("FUENTE 1: INEGI (Scraping de tabla HTML)")
+    print("FUENTE 2: SESNSP (Descarga directa o con navegador)")
+    print("=" * 60)
+    df_inegi, archivo_zip = extraer_fuentes_concurrente()
 
-            print("1. Descarga manualmente el archivo desde:")
-            print("   https://www.gob.mx/sesnsp/acciones-y-programas/datos-abiertos-de-incidencia-delictiva")
+    # La tabla del INEGI se guarda siempre: ya se obtuvo (quiza con Selenium) aunque el ZIP
+    # no se haya descargado o no haya cambiado
+    if df_inegi is not None and len(df_inegi) > 0:
+        print("\n=== GUARDANDO DATOS DEL INEGI ===")
+        guardar_datos(df_inegi, "datos_inegi.csv")
 
-            return
+    if not archivo_zip:
 
-        # Extraer CSV del ZIP
-        ruta_csv = extraer_csv_de_zip(archivo_zip, download_dir)
 
-        if not ruta_csv:
-            print("\n No se pudo extraer el CSV del ZIP")
-            return
+        print("1. Descarga manualmente el archivo desde:")
+        print(f"   {URL_SESNSP}")
 
-        # Procesar datos
-        df_delitos = procesar_datos_sesnsp(ruta_csv)
+        return
 
-        if df_delitos is None or len(df_delitos) == 0:
-            print("\n No se pudieron procesar los datos")
-            return
+    # Si el ZIP es el mismo que ya se proceso no hace falta extraerlo otra vez
+    firma = firma_procesamiento(archivo_zip)
+    if zip_ya_procesado(archivo_zip, firma):
+        print(f"\n Cache: el ZIP no cambio desde la ultima extraccion (sha256 {firma['sha256'][:12]})")
+        print(" Se omite el procesamiento, los archivos de dataset/ estan actualizados")
+        return
 
-        # Generar datos de percepcion
-        df_percepcion = generar_datos_percepcion(df_delitos)
+    print(f"\n Cache: ZIP nuevo o filtros distintos (sha256 {firma['sha256'][:12]}), se procesa")
 
-        #  Guardar datos
-        print("\n=== GUARDANDO DATOS ===")
-        guardar_datos(df_delitos, "incidencia_delictiva.csv")
-        guardar_datos(df_percepcion, "percepcion_seguridad.csv")
+    # Procesar datos leyendo el CSV directamente del ZIP
+    df_delitos = procesar_datos_sesnsp(archivo_zip)
 
-        if df_inegi is not None and len(df_inegi) > 0:
-            guardar_datos(df_inegi, "datos_inegi.csv")
+    if df_delitos is None or len(df_delitos) == 0:
+        print("\n No se pudieron procesar los datos")
+        return
 
-        # Mostrar resumen
-        print("\n" + "=" * 60)
-        print(" EXTRACCIÓN DE DATOS COMPLETADA")
-        print("=" * 60)
-        print(f"\nTotal de registros extraidos: {len(df_delitos)}")
-        print(f"Estados: {df_delitos['estado'].unique().tolist()}")
-        print(f"Años: {sorted(df_delitos['anio'].unique().tolist())}")
-        print(f"Tipos de delito únicos: {df_delitos['tipo_delito'].nunique()}")
+    # Generar datos de percepcion
+    df_percepcion = generar_datos_percepcion(df_delitos)
 
-        print("\nArchivos generados:")
-        print("  - dataset/incidencia_delictiva.csv")
-        print("  - dataset/percepcion_seguridad.csv")
-        if df_inegi is not None:
-            print("  - dataset/datos_inegi.csv")
+    #  Guardar datos
+    print("\n=== GUARDANDO DATOS ===")
+    guardar_datos(df_delitos, "incidencia_delictiva.csv")
+    guardar_datos(df_percepcion, "percepcion_seguridad.csv")
 
-        print("\nMétodos de web scraping utilizados:")
-        print("   Selenium - Navegación automatica")
-        print("   Selenium - Descarga de archivos")
-        if df_inegi is not None:
-            print("  BeautifulSoup - Scraping de tablas HTML")
+    registrar_zip_procesado(archivo_zip, firma)
 
+    # Mostrar resumen
+    print("\n" + "=" * 60)
+    print(" EXTRACCIÓN DE DATOS COMPLETADA")
+    print("=" * 60)
+    print(f"\nTotal de registros extraidos: {len(df_delitos)}")
+    print(f"Estados: {df_delitos['estado'].unique().tolist()}")
+    print(f"Años: {sorted(df_delitos['anio'].unique().tolist())}")
+    print(f"Tipos de delito únicos: {df_delitos['tipo_delito'].nunique()}")
 
+    print("\nArchivos generados:")
+    print(f"  - {ruta_datos('incidencia_delictiva')}")
+    print(f"  - {ruta_datos('percepcion_seguridad')}")
+    if df_inegi is not None:
+        print(f"  - {ruta_datos('datos_inegi')}")
 
-    finally:
-        # Cerrar el navegador
-        print("\nCerrando navegador...")
-        driver.quit()
-        print(" Navegador cerrado")
+    print("\nMétodos de web scraping utilizados:")
+    print("   HTTP con Selenium headless de respaldo - Navegación automatica")
+    print("   HTTP con reanudacion - Descarga de archivos")
+    if df_inegi is not None:
+        print(f"  {MOTOR_HTML} - Scraping de tablas HTML")
 
 
 if __name__ == "__main__":
 
-    main()
+    # python extraccion_datos.py --comparar-html pagina.html
+    if len(sys.argv) > 2 and sys.argv[1] == "--comparar-html":
+        comparar_motores_html(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,61 @@
+-- Migracion: llaves unicas y tabla version_carga para la carga incremental de carga_bd.py
+-- Se ejecuta una vez sobre una base creada con una version anterior de db_seguridadMexico.sql
+-- (las bases nuevas ya incluyen estas llaves y la tabla)
+-- Sin las llaves unicas, ON DUPLICATE KEY UPDATE inserta los registros revisados como filas nuevas
+USE seguridad_mexico;
+
+
+-- incidencia_delictiva
+-- Las cargas completas repetidas dejaron el mismo grano (anio, mes_num, estado, tipo) varias veces;
+-- se conserva la fila mas reciente (mayor id_incidencia) de cada grano
+CREATE TEMPORARY TABLE incidencia_conservar AS
+SELECT MAX(id_incidencia) AS id_incidencia
+FROM incidencia_delictiva
+GROUP BY anio, mes_num, id_estado, id_tipo_delito;
+
+ALTER TABLE incidencia_conservar ADD PRIMARY KEY (id_incidencia);
+
+DELETE i FROM incidencia_delictiva i
+LEFT JOIN incidencia_conservar c ON i.id_incidencia = c.id_incidencia
+WHERE c.id_incidencia IS NULL;
+
+DROP TEMPORARY TABLE incidencia_conservar;
+
+ALTER TABLE incidencia_delictiva
+    ADD UNIQUE KEY uk_incidencia_grano (anio, mes_num, id_estado, id_tipo_delito);
+
+
+-- percepcion_seguridad
+-- Mismo criterio: una fila por (anio, estado), la mas reciente
+CREATE TEMPORARY TABLE percepcion_conservar AS
+SELECT MAX(id_percepcion) AS id_percepcion
+FROM percepcion_seguridad
+GROUP BY anio, id_estado;
+
+ALTER TABLE percepcion_conservar ADD PRIMARY KEY (id_percepcion);
+
+DELETE p FROM percepcion_seguridad p
+LEFT JOIN percepcion_conservar c ON p.id_percepcion = c.id_percepcion
+WHERE c.id_percepcion IS NULL;
+
+DROP TEMPORARY TABLE percepcion_conservar;
+
+-- La llave unica reemplaza al indice idx_anio_estado (mismas columnas)
+ALTER TABLE percepcion_seguridad
+    ADD UNIQUE KEY uk_anio_estado (anio, id_estado),
+    DROP INDEX idx_anio_estado;
+
+
+-- version_carga
+-- carga_bd registra una fila al terminar cada carga; el dashboard la usa para invalidar su cache
+CREATE TABLE IF NOT EXISTS version_carga (
+    id_version INT AUTO_INCREMENT PRIMARY KEY,
+    registros INT,
+    fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+
+-- estadisticas_agregadas se recalcula en la siguiente ejecucion de carga_bd.py
+-- Mostrar las llaves resultantes
+SHOW INDEX FROM incidencia_delictiva;
+SHOW INDEX FROM percepcion_seguridad;
@@ -0,0 +1,45 @@
+-- Migracion: indices compuestos para las consultas de agregacion y del dashboard
+-- Se ejecuta una vez sobre una base creada con una version anterior de db_seguridadMexico.sql
+-- (las bases nuevas ya incluyen estos indices)
+-- Despues de aplicarla: python verificar_indices.py
+USE seguridad_mexico;
+
+
+-- incidencia_delictiva
+-- Cada indice cubre una de las agregaciones de carga_bd.AGREGACIONES (y las vistas v_*):
+-- agrupa por las columnas del indice y suma cantidad sin leer las filas de la tabla
+ALTER TABLE incidencia_delictiva
+    ADD INDEX idx_estado_anio_cantidad (id_estado, anio, cantidad),           -- estado_anio, percepcion
+    ADD INDEX idx_estado_mes_cantidad (id_estado, mes_num, cantidad),         -- estado_mes
+    ADD INDEX idx_tipo_estado_cantidad (id_tipo_delito, id_estado, cantidad), -- tipo_estado, tipo_total
+    ADD INDEX idx_tipo_mes_cantidad (id_tipo_delito, anio, mes_num, cantidad); -- tipo_mes (evolucion)
+
+-- idx_estado e idx_tipo_delito quedan cubiertos por los indices compuestos
+-- (las llaves foraneas usan los nuevos indices porque empiezan con la misma columna)
+ALTER TABLE incidencia_delictiva
+    DROP INDEX idx_estado,
+    DROP INDEX idx_tipo_delito;
+
+
+-- tipos_delito
+-- Busqueda de obtener_id_tipo_delito y de cargar_dimensiones por (nombre, subtipo, modalidad)
+-- Si la tabla tiene duplicados el indice no se puede crear; para encontrarlos:
+--   SELECT nombre, subtipo, modalidad, COUNT(*) FROM tipos_delito
+--   GROUP BY nombre, subtipo, modalidad HAVING COUNT(*) > 1;
+ALTER TABLE tipos_delito
+    ADD UNIQUE KEY uk_tipo_delito (nombre, subtipo, modalidad);
+
+
+-- estadisticas_agregadas
+-- Las consultas del dashboard filtran por tipo_agregacion y leen las demas columnas;
+-- con este indice se resuelven solo con el indice (reemplaza a idx_tipo_agregacion)
+ALTER TABLE estadisticas_agregadas
+    ADD INDEX idx_agregacion_cubierta (tipo_agregacion, id_estado, anio, mes_num,
+                                       id_tipo_delito, total_delitos, promedio_delitos),
+    DROP INDEX idx_tipo_agregacion;
+
+
+-- Mostrar los indices resultantes
+SHOW INDEX FROM incidencia_delictiva;
+SHOW INDEX FROM tipos_delito;
+SHOW INDEX FROM estadisticas_agregadas;
@@ -0,0 +1,288 @@
+import time
+import pandas as pd
+from almacenamiento_datos import ruta_existente
+from esquema_datos import COLUMNAS_DERIVADAS, MESES, aplicar_esquema
+from transformacion_datos import CATEGORIA_OTRO, REGLAS_CATEGORIA, ejecutar_pipeline, leer_datos
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+# Motores alternos para el pipeline de transformacion (ambos embebidos, sin servidor)
+# "polars": lazy frames, el plan completo se optimiza y se ejecuta con collect_all
+# "duckdb": SQL sobre los archivos de dataset/ en una base en memoria
+MOTORES = ["polars", "duckdb"]
+
+# Hilos de DuckDB (None = los que DuckDB detecte); Polars usa POLARS_MAX_THREADS
+HILOS_DUCKDB = None
+# Ejecutar Polars con el motor streaming (procesa los archivos por bloques)
+STREAMING_POLARS = True
+
+COLUMNAS_INCIDENCIA = ["anio", "mes", "mes_num", "estado", "tipo_delito",
+                       "subtipo_delito", "modalidad", "cantidad"]
+COLUMNAS_TEXTO = ["mes", "estado", "tipo_delito", "subtipo_delito", "modalidad"]
+DELITOS_GRAVES = ["Homicidio", "Secuestro"]
+UMBRAL_ALTA_INCIDENCIA = 100
+
+# Salidas del pipeline que se comparan entre motores
+SALIDAS_COMPARADAS = ["delitos", "total_estado", "promedio_mensual",
+                      "graves", "alta_incidencia", "unido"]
+
+
+def ejecutar_polars(ruta_delitos, ruta_percepcion):
+    """
+    Ejecuta el pipeline con lazy frames de Polars
+    Todas las salidas se recolectan juntas para que Polars comparta los subplanes comunes
+    """
+    if pl is None:
+        raise ImportError("El motor polars requiere el paquete polars")
+
+    delitos = _leer_polars(ruta_delitos).select(COLUMNAS_INCIDENCIA)
+    percepcion = _leer_polars(ruta_percepcion).select(["anio", "estado", "percepcion_inseguridad"])
+
+    # Limpiar: duplicados, nulos y cantidades no positivas; despues quitar espacios
+    # y descartar meses fuera de MESES (igual que limpiar_datos)
+    delitos = (
+        delitos
+        .with_columns(pl.col(COLUMNAS_TEXTO).cast(pl.Utf8), pl.col("anio").cast(pl.Int64))
+        .unique(maintain_order=True)
+        .filter(pl.all_horizontal(pl.col(["anio", "mes", "estado", "tipo_delito", "cantidad"]).is_not_null())
+                & (pl.col("cantidad") > 0))
+        .with_columns(pl.col(["estado", "tipo_delito", "mes"]).str.strip_chars())
+        .filter(pl.col("mes").is_in(MESES))
+    )
+
+    # Categoria con la tabla de reglas, porcentaje por estado y normalizacion min-max
+    tipo = pl.col("tipo_delito").str.to_lowercase()
+    categoria = None
+    for nombre, palabras in REGLAS_CATEGORIA:
+        condicion = pl.all_horizontal([tipo.str.contains(palabra, literal=True) for palabra in palabras])
+        categoria = (pl.when(condicion) if categoria is None else categoria.when(condicion)).then(pl.lit(nombre))
+    categoria = categoria.otherwise(pl.lit(CATEGORIA_OTRO))
+
+    cantidad = pl.col("cantidad")
+    delitos = delitos.with_columns(
+        categoria.alias("categoria_delito"),
+        (cantidad / cantidad.sum().over("estado") * 100).alias("porcentaje_estado"),
+        ((cantidad - cantidad.min()) / (cantidad.max() - cantidad.min())).alias("cantidad_normalizada"),
+    )
+
+    consultas = {
+        "delitos": delitos,
+        "total_estado": delitos.group_by("estado").agg(cantidad.sum().alias("total_delitos")),
+        "promedio_mensual": delitos.group_by("estado").agg(cantidad.mean().alias("promedio_mensual")),
+        "graves": delitos.filter(pl.col("categoria_delito").is_in(DELITOS_GRAVES)),
+        "alta_incidencia": delitos.filter(cantidad >= UMBRAL_ALTA_INCIDENCIA),
+        "unido": (
+            delitos.group_by(["anio", "estado"]).agg(cantidad.sum().alias("total_delitos"))
+            .join(percepcion.with_columns(pl.col("estado").cast(pl.Utf8), pl.col("anio").cast(pl.Int64)),
+                  on=["anio", "estado"], how="left")
+        ),
+    }
+
+    resultados = _recolectar_polars(list(consultas.values()))
+
+    return {nombre: df.to_pandas() for nombre, df in zip(consultas, resultados)}
+
+
+def _leer_polars(ruta):
+    if ruta.endswith(".parquet"):
+        return pl.scan_parquet(ruta)
+    if ruta.endswith(".feather"):
+        return pl.scan_ipc(ruta)
+    return pl.scan_csv(ruta)
+
+
+def _recolectar_polars(consultas):
+    # El parametro del motor streaming cambio de nombre entre versiones de Polars
+    if STREAMING_POLARS:
+        try:
+            return pl.collect_all(consultas, engine="streaming")
+        except (TypeError, ValueError):
+            return pl.collect_all(consultas, streaming=True)
+
+    return pl.collect_all(consultas)
+
+
+def sql_categoria(columna="tipo_delito"):
+    """
+    Expresion CASE con la tabla de reglas de categorias
+    """
+    casos = []
+    for nombre, palabras in REGLAS_CATEGORIA:
+        condicion = " AND ".join(f"contains(lower({columna}), {_literal(palabra)})" for palabra in palabras)
+        casos.append(f"WHEN {condicion} THEN {_literal(nombre)}")
+
+    return f"CASE {' '.join(casos)} ELSE {_literal(CATEGORIA_OTRO)} END"
+
+
+def ejecutar_duckdb(ruta_delitos, ruta_percepcion, hilos=None):
+    """
+    Ejecuta el pipeline con SQL de DuckDB sobre los archivos de dataset/
+    La tabla de delitos transformados se materializa una vez y el resto de las salidas se consulta sobre ella
+    """
+    if duckdb is None:
+        raise ImportError("El motor duckdb requiere el paquete duckdb")
+
+    hilos = hilos or HILOS_DUCKDB
+
+    with duckdb.connect() as con:
+        if hilos:
+            con.execute(f"SET threads = {int(hilos)}")
+
+        origen = _origen_duckdb(con, "origen_delitos", ruta_delitos)
+        percepcion = _origen_duckdb(con, "origen_percepcion", ruta_percepcion)
+
+        con.execute(f"""
+            CREATE TEMP TABLE delitos AS
+            WITH crudo AS (
+                SELECT DISTINCT {', '.join(COLUMNAS_INCIDENCIA)}
+                FROM {origen}
+            ),
+            limpio AS (
+                SELECT anio, trim(mes) AS mes, mes_num, trim(estado) AS estado,
+                       trim(tipo_delito) AS tipo_delito, subtipo_delito, modalidad, cantidad
+                FROM crudo
+                WHERE anio IS NOT NULL AND estado IS NOT NULL
+                  AND tipo_delito IS NOT NULL AND cantidad > 0
+                  AND trim(mes) IN ({', '.join(_literal(mes) for mes in MESES)})
+            )
+            SELECT *,
+                   {sql_categoria()} AS categoria_delito,
+                   CAST(cantidad AS DOUBLE) / SUM(cantidad) OVER (PARTITION BY estado) * 100
+                       AS porcentaje_estado,
+                   CAST(cantidad - MIN(cantidad) OVER () AS DOUBLE)
+                       / (MAX(cantidad) OVER () - MIN(cantidad) OVER ()) AS cantidad_normalizada
+            FROM limpio
+        """)
+
+        graves = ", ".join(_literal(categoria) for categoria in DELITOS_GRAVES)
+        consultas = {
+            "delitos": "SELECT * FROM delitos",
+            "total_estado": "SELECT estado, CAST(SUM(cantidad) AS BIGINT) AS total_delitos FROM delitos GROUP BY estado",
+            "promedio_mensual": "SELECT estado, AVG(cantidad) AS promedio_mensual FROM delitos GROUP BY estado",
+            "graves": f"SELECT * FROM delitos WHERE categoria_delito IN ({graves})",
+            "alta_incidencia": f"SELECT * FROM delitos WHERE cantidad >= {UMBRAL_ALTA_INCIDENCIA}",
+            "unido": f"""
+                SELECT d.anio, d.estado, d.total_delitos, p.percepcion_inseguridad
+                FROM (SELECT anio, estado, CAST(SUM(cantidad) AS BIGINT) AS total_delitos
+                      FROM delitos GROUP BY anio, estado) d
+                LEFT JOIN {percepcion} p
+                    ON d.anio = p.anio AND d.estado = p.estado
+            """,
+        }
+
+        return {nombre: con.execute(sql).df() for nombre, sql in consultas.items()}
+
+
+def _origen_duckdb(con, nombre, ruta):
+    # Vista sobre el archivo; DuckDB no lee Feather directamente y se registra como tabla de Arrow
+    if ruta.endswith(".feather"):
+        from pyarrow import feather
+        con.register(nombre, feather.read_table(ruta))
+    else:
+        lector = "read_parquet" if ruta.endswith(".parquet") else "read_csv_auto"
+        con.execute(f"CREATE TEMP VIEW {nombre} AS SELECT * FROM {lector}({_literal(ruta)})")
+
+    return nombre
+
+
+def _literal(texto):
+    return "'" + texto.replace("'", "''") + "'"
+
+
+def ejecutar_motor(motor, nombre_delitos="incidencia_delictiva", nombre_percepcion="percepcion_seguridad"):
+    """
+    Ejecuta el pipeline de transformacion con el motor indicado sobre los archivos de dataset/
+    Retorna el contexto con las mismas salidas que ejecutar_pipeline (delitos, total_estado,
+    promedio_mensual, graves, alta_incidencia, unido); los delitos quedan con el esquema compartido
+    """
+    ruta_delitos, _ = ruta_existente(nombre_delitos)
+    ruta_percepcion, _ = ruta_existente(nombre_percepcion)
+
+    print(f"\n=== TRANSFORMACION CON {motor.upper()} ===")
+    inicio = time.perf_counter()
+
+    if motor == "polars":
+        contexto = ejecutar_polars(ruta_delitos, ruta_percepcion)
+    elif motor == "duckdb":
+        contexto = ejecutar_duckdb(ruta_delitos, ruta_percepcion)
+    else:
+        raise ValueError(f"Motor de transformacion no soportado: {motor}")
+
+    for nombre in ["delitos", "graves", "alta_incidencia"]:
+        contexto[nombre] = aplicar_esquema(contexto[nombre])
+
+    print(f" Transformacion completada en {(time.perf_counter() - inicio) * 1000:.2f} ms")
+    print(f" Registros transformados: {len(contexto['delitos'])}")
+
+    return contexto
+
+
+def _para_comparar(df):
+    # Sin indice, sin categoricas y ordenado por todas las columnas, porque
+    # DISTINCT/GROUP BY no conservan el orden de pandas
+    df = df.drop(columns=[c for c in COLUMNAS_DERIVADAS if c in df.columns]).reset_index(drop=True)
+    for columna in df.columns:
+        if isinstance(df[columna].dtype, pd.CategoricalDtype):
+            df[columna] = df[columna].astype(object)
+
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def verificar_paridad(motores=None):
+    """
+    Ejecuta el pipeline con pandas y con cada motor, y compara todas las salidas
+    Retorna True si todos los motores producen los mismos resultados
+    """
+    motores = motores or MOTORES
+
+    print("\n=== VERIFICANDO PARIDAD DE MOTORES ===")
+
+    df_delitos, df_percepcion = leer_datos()
+    inicio = time.perf_counter()
+    esperado, _ = ejecutar_pipeline({"delitos": df_delitos, "percepcion": df_percepcion},
+                                    medir_memoria=False)
+    tiempos = {"pandas": time.perf_counter() - inicio}
+
+    resultados = []
+
+    for motor in motores:
+        inicio = time.perf_counter()
+        try:
+            obtenido = ejecutar_motor(motor)
+        except ImportError as e:
+            print(f" Se omite {motor}: {e}")
+            continue
+        tiempos[motor] = time.perf_counter() - inicio
+
+        for salida in SALIDAS_COMPARADAS:
+            try:
+                pd.testing.assert_frame_equal(_para_comparar(esperado[salida]),
+                                              _para_comparar(obtenido[salida]),
+                                              check_dtype=False)
+                igual, detalle = True, ""
+            except AssertionError as e:
+                igual, detalle = False, str(e).splitlines()[0]
+
+            resultados.append({"motor": motor, "salida": salida, "igual": igual, "detalle": detalle})
+
+    df_resultados = pd.DataFrame(resultados, columns=["motor", "salida", "igual", "detalle"])
+    print(df_resultados.to_string(index=False))
+
+    print("\nTiempo total por motor:")
+    for motor, tiempo in tiempos.items():
+        print(f"  {motor}: {tiempo * 1000:.2f} ms")
+
+    return bool(df_resultados["igual"].all())
+
+
+if __name__ == "__main__":
+    verificar_paridad()
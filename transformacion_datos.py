@@ -1,19 +1,52 @@
+import numpy as np
 import pandas as pd
-import os
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from io import StringIO
+from almacenamiento_datos import guardar_tabla, leer_tabla
+from esquema_datos import ESQUEMA_LECTURA, aplicar_esquema, convertir_tipos, quitar_espacios, reportar_memoria
+
+
+# Reglas para categorizar delitos: (categoria, palabras que deben aparecer en el tipo de delito)
+# Se aplica la primera regla que coincida, en orden
+REGLAS_CATEGORIA = [
+    ("Homicidio", ["homicidio"]),
+    ("Secuestro", ["secuestro"]),
+    ("Robo", ["robo"]),
+    ("Violencia familiar", ["violencia", "familiar"]),
+    ("Lesiones", ["lesion"]),
+]
+CATEGORIA_OTRO = "Otro"
+
+# Motor del pipeline: "pandas", "polars" o "duckdb" (ver motores_transformacion.py)
+MOTOR_TRANSFORMACION = "pandas"
+# Modo de ejecucion con pandas: "secuencial" (un proceso) o "particionado" (un proceso por grupo de particiones)
+MODO_TRANSFORMACION = "secuencial"
+# Columnas por las que se divide la incidencia en modo particionado: ["estado"] o ["estado", "anio"]
+COLUMNAS_PARTICION = ["estado"]
+# Numero de procesos (None = numero de CPUs)
+PROCESOS_TRANSFORMACION = None
+# Pasos que solo dependen de registros del mismo estado y se pueden ejecutar por particion
+PASOS_PARTICIONABLES = ["limpiar", "agregar_columnas"]
+# Ejecutar los pasos fusionables consecutivos como un solo paso (ver FUSIONES)
+FUSIONAR_PASOS = True
+# Medir la memoria pico de cada paso con tracemalloc (hace mas lenta cada asignacion de memoria)
+MEDIR_MEMORIA = False
 
 
 def leer_datos():
-   #Leer los dato extraidos de los archivos csv
+   #Leer los dato extraidos de los archivos de dataset/ (CSV o Parquet)
     print("\n=== LEYENDO DATOS EXTRAIDOS ===")
 
-    archivo_incidencia = os.path.join("dataset", "incidencia_delictiva.csv")
-    archivo_percepcion = os.path.join("dataset", "percepcion_seguridad.csv")
-
     try:
-        df_incidencia = pd.read_csv(archivo_incidencia, encoding='utf-8')
-        df_percepcion = pd.read_csv(archivo_percepcion, encoding='utf-8')
+        df_incidencia = leer_tabla("incidencia_delictiva", esquema=ESQUEMA_LECTURA)
+        df_percepcion = leer_tabla("percepcion_seguridad")
 
         print(f" Datos de incidencia cargados: {len(df_incidencia)} registros")
+        reportar_memoria(df_incidencia, "transformacion")
         print(f" Datos de percepción cargados: {len(df_percepcion)} registros")
 
         return df_incidencia, df_percepcion
@@ -27,73 +60,106 @@ def limpiar_datos(df):
 
     print("\n=== LIMPIANDO DATOS ===")
 
-    registros_iniciales = len(df)
+    return limpiar_registros(df)
+
+
+def limpiar_registros(df):
 
-    # Eliminar duplicados
-    df = df.drop_duplicates()
-    print(f" Duplicados eliminados: {registros_iniciales - len(df)}")
+    #Elimina duplicados, nulos y cantidades no positivas, quita espacios y aplica los tipos compactos
+    #Retorna una sola copia del DataFrame; las conversiones se hacen sobre esa copia
 
-    # Eliminar registros con valores nulos en columnas importantes
-    df = df.dropna(subset=['anio', 'estado', 'tipo_delito', 'cantidad'])
-    print(f" Registros con nulos eliminados: {registros_iniciales - len(df)}")
+    # Los tres filtros se combinan en una sola mascara para copiar el DataFrame una vez
+    duplicados = df.duplicated()
+    nulos = df[['anio', 'mes', 'estado', 'tipo_delito', 'cantidad']].isna().any(axis=1)
+    no_positivos = ~(df['cantidad'] > 0).fillna(False)
 
-    # Validar que cantidad sea positiva
-    df = df[df['cantidad'] > 0]
+    print(f" Duplicados eliminados: {int(duplicados.sum())}")
+    print(f" Registros con nulos eliminados: {int((nulos & ~duplicados).sum())}")
+
+    # Eliminar duplicados, nulos y cantidades no positivas
+    df = df.loc[~(duplicados | nulos | no_positivos)].copy()
 
     # Limpiar espacios en blanco
-    df['estado'] = df['estado'].str.strip()
-    df['tipo_delito'] = df['tipo_delito'].str.strip()
-    df['mes'] = df['mes'].str.strip()
+    df['estado'] = quitar_espacios(df['estado'])
+    df['tipo_delito'] = quitar_espacios(df['tipo_delito'])
+    df['mes'] = quitar_espacios(df['mes'])
+
+    # Ya sin nulos ni espacios se aplican los tipos compactos; un mes fuera de MESES queda nulo
+    df = convertir_tipos(df)
+    mes_invalido = df['mes'].isna()
+    if mes_invalido.any():
+        print(f" Registros con mes no reconocido eliminados: {int(mes_invalido.sum())}")
+        df = df.loc[~mes_invalido].copy()
 
     print(f" Datos limpios: {len(df)} registros")
 
     return df
 
 
+def categorizar_delitos(serie, reglas=None):
+
+    #Categoriza una columna de tipos de delito con la tabla de reglas
+    #Las reglas se evaluan una sola vez por valor distinto y el resultado
+    #se reparte a todos los registros con los codigos de factorize
+
+    reglas = reglas or REGLAS_CATEGORIA
+
+    codigos, valores = pd.factorize(serie)
+    texto = pd.Series(valores.astype(str)).str.lower()
+
+    condiciones = [
+        np.logical_and.reduce([texto.str.contains(palabra, regex=False).to_numpy()
+                               for palabra in palabras])
+        for _, palabras in reglas
+    ]
+    categorias = np.select(condiciones, [categoria for categoria, _ in reglas],
+                           default=CATEGORIA_OTRO)
+
+    # El codigo -1 (valores nulos) toma la ultima posicion: CATEGORIA_OTRO
+    categorias = np.append(categorias, CATEGORIA_OTRO).astype(object)
+
+    # El resultado queda como categorica (esquema compartido)
+    nombres, codigos_categoria = np.unique(categorias, return_inverse=True)
+    return pd.Series(pd.Categorical.from_codes(codigos_categoria[codigos], nombres),
+                     index=serie.index)
+
+
 def agregar_columnas(df):
 
     print("\n=== AGREGANDO COLUMNAS CALCULADAS ===")
 
     # Categorizar delitos en grupos principales
-    def categorizar_delito(tipo):
-        tipo_lower = str(tipo).lower()
-        if 'homicidio' in tipo_lower:
-            return 'Homicidio'
-        elif 'secuestro' in tipo_lower:
-            return 'Secuestro'
-        elif 'robo' in tipo_lower:
-            return 'Robo'
-        elif 'violencia' in tipo_lower and 'familiar' in tipo_lower:
-            return 'Violencia familiar'
-        elif 'lesion' in tipo_lower:
-            return 'Lesiones'
-        else:
-            return 'Otro'
-
-    df['categoria_delito'] = df['tipo_delito'].apply(categorizar_delito)
+    df['categoria_delito'] = categorizar_delitos(df['tipo_delito'])
 
     # Calcular porcentaje por estado
-    total_por_estado = df.groupby('estado')['cantidad'].transform('sum')
-    df['porcentaje_estado'] = (df['cantidad'] / total_por_estado) * 100
+    df['porcentaje_estado'] = porcentaje_por_estado(df)
 
     print("✓ Columnas agregadas: categoria_delito, porcentaje_estado")
 
     return df
 
 
+def porcentaje_por_estado(df):
+
+    #Porcentaje que representa cada registro del total de delitos de su estado
+
+    total_por_estado = df.groupby('estado', observed=True)['cantidad'].transform('sum')
+    return (df['cantidad'] / total_por_estado) * 100
+
+
 def calcular_estadisticas(df):
 
     print("\n=== CALCULANDO ESTADISTICAS ===")
 
     # Total de delitos por estado
-    total_estado = df.groupby("estado")["cantidad"].sum().reset_index()
+    total_estado = df.groupby("estado", observed=True)["cantidad"].sum().reset_index()
     total_estado.columns = ["estado", "total_delitos"]
 
     print("\nTotal de delitos por estado:")
     print(total_estado.to_string(index=False))
 
     # Promedio mensual por estado
-    promedio_mensual = df.groupby("estado")["cantidad"].mean().reset_index()
+    promedio_mensual = df.groupby("estado", observed=True)["cantidad"].mean().reset_index()
     promedio_mensual.columns = ["estado", "promedio_mensual"]
 
     print("\nPromedio mensual por estado:")
@@ -119,6 +185,32 @@ def normalizar_datos(df):
     return df
 
 
+def transformar_fusionado(df):
+
+    #Paso fusionado de limpiar, agregar_columnas y normalizar sobre una sola copia del DataFrame
+    #El total por estado y el min/max salen del mismo arreglo de cantidades,
+    #sin agrupar ni recorrer el DataFrame otra vez en cada paso
+
+    print("\n=== LIMPIANDO, CATEGORIZANDO Y NORMALIZANDO (PASO FUSIONADO) ===")
+
+    df = limpiar_registros(df)
+
+    cantidad = df['cantidad'].to_numpy(dtype=np.float64)
+    codigos_estado = df['estado'].cat.codes.to_numpy()
+    total_estado = np.bincount(codigos_estado, weights=cantidad)
+    minimo, maximo = (cantidad.min(), cantidad.max()) if len(cantidad) else (0.0, 0.0)
+
+    df['categoria_delito'] = categorizar_delitos(df['tipo_delito'])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df['porcentaje_estado'] = cantidad / total_estado[codigos_estado] * 100
+        df['cantidad_normalizada'] = (cantidad - minimo) / (maximo - minimo)
+
+    print(f"✓ Columnas agregadas: categoria_delito, porcentaje_estado, cantidad_normalizada "
+          f"(rango: {minimo:.0f} - {maximo:.0f})")
+
+    return df
+
+
 def filtrar_datos(df):
 
     print("\n=== FILTRANDO DATOS ===")
@@ -142,7 +234,7 @@ def unir_datos(df_delitos, df_percepcion):
     print("\n=== UNIENDO DATOS ===")
 
     # Agrupar delitos por año y estado
-    df_delitos_agrupado = df_delitos.groupby(["anio", "estado"])["cantidad"].sum().reset_index()
+    df_delitos_agrupado = df_delitos.groupby(["anio", "estado"], observed=True)["cantidad"].sum().reset_index()
     df_delitos_agrupado.columns = ["anio", "estado", "total_delitos"]
 
     # Unir con percepción
@@ -162,12 +254,9 @@ def unir_datos(df_delitos, df_percepcion):
 
 def guardar_datos_transformados(df, nombre_archivo):
 
-    #Guarda los datos transformados en CSV
+    #Guarda los datos transformados con el formato configurado (CSV o Parquet)
 
-    ruta = os.path.join("dataset", nombre_archivo)
-    df.to_csv(ruta, index=False, encoding='utf-8')
-    print(f" Guardado: {ruta}")
-    return ruta
+    return guardar_tabla(df, nombre_archivo)
 
 
 def mostrar_resumen(df):
@@ -179,17 +268,181 @@ def mostrar_resumen(df):
     print(f"Promedio de delitos por registro: {df['cantidad'].mean():.2f}")
 
     print("\n--- Por Estado ---")
-    estado_stats = df.groupby('estado')['cantidad'].agg(['sum', 'mean', 'count'])
+    estado_stats = df.groupby('estado', observed=True)['cantidad'].agg(['sum', 'mean', 'count'])
     print(estado_stats)
 
     print("\n--- Por Categoria de Delito ---")
-    delito_stats = df.groupby('categoria_delito')['cantidad'].agg(['sum', 'mean', 'count'])
+    delito_stats = df.groupby('categoria_delito', observed=True)['cantidad'].agg(['sum', 'mean', 'count'])
     print(delito_stats.sort_values('sum', ascending=False))
 
 
+# Paso del pipeline de transformacion
+# entradas/salidas son nombres de DataFrames en el contexto del pipeline
+# fusionable indica que el paso trabaja registro por registro sobre delitos y se puede
+# combinar con los pasos fusionables vecinos en una funcion de FUSIONES
+PasoTransformacion = namedtuple("PasoTransformacion",
+                                ["nombre", "funcion", "entradas", "salidas", "fusionable"],
+                                defaults=[False])
+
+PIPELINE = [
+    PasoTransformacion("limpiar", limpiar_datos, ["delitos"], ["delitos"], True),
+    PasoTransformacion("agregar_columnas", agregar_columnas, ["delitos"], ["delitos"], True),
+    PasoTransformacion("normalizar", normalizar_datos, ["delitos"], ["delitos"], True),
+    PasoTransformacion("estadisticas", calcular_estadisticas, ["delitos"],
+                       ["total_estado", "promedio_mensual"]),
+    PasoTransformacion("filtrar", filtrar_datos, ["delitos"], ["graves", "alta_incidencia"]),
+    PasoTransformacion("unir", unir_datos, ["delitos", "percepcion"], ["unido"]),
+]
+
+# Archivos que se guardan al terminar: nombre en el contexto -> archivo en dataset/
+# delitos_normalizados ya no se escribe porque era identico a delitos_transformados
+SALIDAS_PIPELINE = {
+    "delitos": "delitos_transformados",
+    "unido": "datos_unidos",
+}
+
+
+# Pasos fusionables consecutivos -> funcion que los ejecuta en una sola pasada
+FUSIONES = {
+    ("limpiar", "agregar_columnas", "normalizar"): transformar_fusionado,
+}
+
+
+def fusionar_pasos(pasos):
+
+    #Reemplaza cada serie de pasos fusionables consecutivos por su funcion de FUSIONES
+    #Las series sin funcion registrada (por ejemplo solo normalizar) se dejan como estan
+
+    resultado = []
+    serie = []
+
+    for paso in list(pasos) + [None]:
+        if paso is not None and paso.fusionable:
+            serie.append(paso)
+            continue
+
+        nombres = tuple(p.nombre for p in serie)
+        if nombres in FUSIONES:
+            resultado.append(PasoTransformacion("+".join(nombres), FUSIONES[nombres],
+                                                serie[0].entradas, serie[-1].salidas))
+        else:
+            resultado.extend(serie)
+        serie = []
+
+        if paso is not None:
+            resultado.append(paso)
+
+    return resultado
+
+
+def ejecutar_pipeline(contexto, pasos=None, medir_memoria=None, fusionar=None):
+
+    #Ejecuta los pasos del pipeline sobre el contexto (diccionario de DataFrames)
+    #Reporta el tiempo de cada paso y, con medir_memoria, su memoria pico
+
+    pasos = pasos or PIPELINE
+    if FUSIONAR_PASOS if fusionar is None else fusionar:
+        pasos = fusionar_pasos(pasos)
+    if medir_memoria is None:
+        medir_memoria = MEDIR_MEMORIA
+    reporte = []
+
+    iniciar_medicion = medir_memoria and not tracemalloc.is_tracing()
+    if iniciar_medicion:
+        tracemalloc.start()
+
+    try:
+        for paso in pasos:
+            argumentos = [contexto[nombre] for nombre in paso.entradas]
+
+            if medir_memoria:
+                tracemalloc.reset_peak()
+                memoria_base = tracemalloc.get_traced_memory()[0]
+
+            inicio = time.perf_counter()
+            resultado = paso.funcion(*argumentos)
+            duracion = time.perf_counter() - inicio
+
+            if len(paso.salidas) == 1:
+                resultado = (resultado,)
+            contexto.update(zip(paso.salidas, resultado))
+
+            reporte.append({
+                "paso": paso.nombre,
+                "tiempo_ms": round(duracion * 1000, 2),
+                "memoria_pico_mb": round((tracemalloc.get_traced_memory()[1] - memoria_base)
+                                         / 1024 ** 2, 2) if medir_memoria else None,
+            })
+    finally:
+        if iniciar_medicion:
+            tracemalloc.stop()
+
+    df_reporte = pd.DataFrame(reporte)
+    print("\n=== TIEMPO Y MEMORIA POR PASO ===" if medir_memoria else "\n=== TIEMPO POR PASO ===")
+    print(df_reporte.to_string(index=False))
+
+    return contexto, df_reporte
+
+
+def transformar_particion(df, nombres_pasos):
+
+    #Ejecuta en un proceso hijo los pasos particionables sobre una particion
+    #Los mensajes de cada paso se descartan para no repetirlos por cada particion
+
+    pasos = {paso.nombre: paso for paso in PIPELINE}
+
+    with redirect_stdout(StringIO()):
+        for nombre in nombres_pasos:
+            df = pasos[nombre].funcion(df)
+
+    return df
+
+
+def ejecutar_particionado(contexto, columnas=None, procesos=None):
+
+    #Ejecuta el pipeline dividiendo la incidencia por estado (y opcionalmente anio)
+    #Los pasos particionables corren en un pool de procesos y sus resultados se unen;
+    #los pasos que necesitan todos los registros (como el min-max de normalizar_datos)
+    #se ejecutan despues sobre el DataFrame unido
+
+    columnas = columnas or COLUMNAS_PARTICION
+    procesos = procesos or PROCESOS_TRANSFORMACION
+
+    print(f"\n=== TRANSFORMACION PARTICIONADA POR {', '.join(columnas).upper()} ===")
+
+    inicio = time.perf_counter()
+    df = contexto["delitos"]
+
+    # Las llaves se agrupan sin espacios (como quedan despues de limpiar_datos) para que
+    # "Sinaloa " y "Sinaloa" caigan en la misma particion y porcentaje_estado use su total
+    claves = [df[columna] if pd.api.types.is_numeric_dtype(df[columna]) else quitar_espacios(df[columna])
+              for columna in columnas]
+    particiones = [grupo for _, grupo in df.groupby(claves, observed=True, sort=False)]
+
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        resultados = list(executor.map(transformar_particion, particiones,
+                                       [PASOS_PARTICIONABLES] * len(particiones)))
+
+    # Al unir, las categoricas con categorias distintas por particion se vuelven object
+    # y se convierten de nuevo al esquema; el orden original se recupera con el indice
+    df = aplicar_esquema(pd.concat(resultados).sort_index())
+
+    # El porcentaje es por estado: si las particiones tambien dividen por año se recalcula global
+    if any(columna != "estado" for columna in columnas):
+        df['porcentaje_estado'] = porcentaje_por_estado(df)
+
+    print(f" Particiones procesadas: {len(particiones)} en "
+          f"{(time.perf_counter() - inicio) * 1000:.2f} ms")
+
+    contexto["delitos"] = df
+    pasos_globales = [paso for paso in PIPELINE if paso.nombre not in PASOS_PARTICIONABLES]
+
+    return ejecutar_pipeline(contexto, pasos_globales)
+
+
 def transformar_todos():
 
-    #Ejecuta todas las transformaciones
+    #Ejecuta todas las transformaciones con el pipeline declarado en PIPELINE
 
     print("=" * 60)
     print("TRANSFORMACION Y LIMPIEZA DE DATOS")
@@ -203,39 +456,32 @@ def transformar_todos():
         print("\n No se pundieron leer los datos")
         return None, None, None
 
-    #  Limpiar datos
-    df_delitos_limpio = limpiar_datos(df_delitos)
-
-    #  Agregar columnas calculadas
-    df_delitos_limpio = agregar_columnas(df_delitos_limpio)
-
-    #  Calcular estadisticas
-    total_estado, promedio_mensual = calcular_estadisticas(df_delitos_limpio)
-
-    #  Filtrar datos
-    df_graves, df_alta_incidencia = filtrar_datos(df_delitos_limpio)
-
-    #  Normalizar datos
-    df_normalizado = normalizar_datos(df_delitos_limpio)
-
-    #  Unir datos con percepcion
-    df_unido = unir_datos(df_delitos_limpio, df_percepcion)
+    #  Limpiar, enriquecer, normalizar, calcular estadisticas, filtrar y unir
+    contexto = {"delitos": df_delitos, "percepcion": df_percepcion}
+    if MOTOR_TRANSFORMACION != "pandas":
+        # Se importa aqui porque motores_transformacion usa las reglas de este modulo
+        from motores_transformacion import ejecutar_motor
+        contexto.update(ejecutar_motor(MOTOR_TRANSFORMACION))
+    elif MODO_TRANSFORMACION == "particionado":
+        contexto, _ = ejecutar_particionado(contexto)
+    else:
+        contexto, _ = ejecutar_pipeline(contexto)
 
     # Guardar datos transformados
     print("\n=== GUARDANDO DATOS TRANSFORMADOS ===")
-    guardar_datos_transformados(df_delitos_limpio, "delitos_transformados.csv")
-    guardar_datos_transformados(df_normalizado, "delitos_normalizados.csv")
-    guardar_datos_transformados(df_unido, "datos_unidos.csv")
+    for nombre, archivo in SALIDAS_PIPELINE.items():
+        guardar_datos_transformados(contexto[nombre], archivo)
 
     # Mostrar resumen
-    mostrar_resumen(df_delitos_limpio)
+    mostrar_resumen(contexto["delitos"])
 
     print("\n" + "=" * 60)
     print(" TRANSFORMACIÓN DE DATOS COMPLETADA")
     print("=" * 60)
 
 
-    return df_delitos_limpio, df_normalizado, df_unido
+    # Los datos normalizados son el mismo DataFrame que los transformados
+    return contexto["delitos"], contexto["delitos"], contexto["unido"]
 
 
 if __name__ == "__main__":
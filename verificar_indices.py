@@ -0,0 +1,84 @@
+import re
+import sys
+from carga_bd import AGREGACIONES, SQL_ID_TIPO_DELITO, etapa_carga
+from dashboard import CONSULTAS
+
+
+# Tablas grandes en las que no se permite un recorrido completo (type = ALL en EXPLAIN)
+# Recorrer un indice completo (type = index) si se permite: es el caso de los indices que cubren una agregacion
+TABLAS_HECHOS = ["incidencia_delictiva", "estadisticas_agregadas"]
+
+PALABRAS_SQL = {"ON", "WHERE", "GROUP", "ORDER", "JOIN", "LEFT", "INNER", "LIMIT", "USING"}
+
+
+def alias_tablas(sql):
+    """
+    Relaciona cada alias del SQL con su tabla (EXPLAIN reporta el alias)
+    """
+    alias = {}
+    for tabla, nombre in re.findall(r"(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.IGNORECASE):
+        alias[tabla] = tabla
+        if nombre and nombre.upper() not in PALABRAS_SQL:
+            alias[nombre] = tabla
+    return alias
+
+
+def explicar(cursor, sql, params=None):
+    """
+    Ejecuta EXPLAIN y retorna cada fila del plan como diccionario
+    """
+    cursor.execute("EXPLAIN " + sql, params)
+    columnas = [columna[0] for columna in cursor.description]
+    return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+
+def consultas_a_verificar(cursor):
+    """
+    Consultas del dashboard, agregaciones de la carga y busqueda de tipos de delito,
+    con las tablas que no deben recorrerse completas en cada una
+    """
+    consultas = [(f"dashboard {nombre}", sql, None, TABLAS_HECHOS) for nombre, sql in CONSULTAS.items()]
+    consultas += [(f"agregacion {nombre}", sql, None, TABLAS_HECHOS) for nombre, sql in AGREGACIONES.items()]
+
+    cursor.execute("SELECT nombre, subtipo, modalidad FROM tipos_delito LIMIT 1")
+    ejemplo = cursor.fetchone() or ("Homicidio", "Homicidio doloso", "Con arma de fuego")
+    consultas.append(("carga obtener_id_tipo_delito", SQL_ID_TIPO_DELITO, tuple(ejemplo), ["tipos_delito"]))
+
+    return consultas
+
+
+def verificar_indices():
+    """
+    Revisa con EXPLAIN que ninguna consulta recorra completa una tabla vigilada
+    Retorna True si todas usan indices
+    """
+    print("\n=== VERIFICANDO PLANES DE CONSULTA (EXPLAIN) ===")
+
+    fallas = []
+
+    with etapa_carga("verificación de índices") as (conexion, cursor):
+        for nombre, sql, params, tablas in consultas_a_verificar(cursor):
+            alias = alias_tablas(sql)
+            plan = explicar(cursor, sql, params)
+
+            recorridos = [alias.get(paso["table"], paso["table"]) for paso in plan
+                          if paso["type"] == "ALL" and alias.get(paso["table"], paso["table"]) in tablas]
+            indices = sorted({f"{alias.get(paso['table'], paso['table'])}.{paso['key']}"
+                              for paso in plan if paso.get("key")})
+
+            if recorridos:
+                fallas.append(nombre)
+                print(f" ✗ {nombre}: recorrido completo de {', '.join(recorridos)}")
+            else:
+                print(f" ✓ {nombre}: {', '.join(indices) or 'sin tablas vigiladas'}")
+
+    if fallas:
+        print(f"\n {len(fallas)} consultas recorren tablas completas; aplicar migracion_indices.sql")
+    else:
+        print("\n Todas las consultas usan indices")
+
+    return not fallas
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verificar_indices() else 1)